@@ -0,0 +1,190 @@
+# ======================================================
+# ANALYSIS WRITER
+# Buffered background writes into email_analysis and result_cache
+# ======================================================
+
+import atexit
+import queue
+import sys
+import threading
+import time
+
+from config import (
+    ANALYSIS_WRITER_BATCH,
+    ANALYSIS_WRITER_FLUSH_SECONDS,
+    ANALYSIS_WRITER_QUEUE
+)
+from database import (
+    analysis_row,
+    insert_analysis_rows,
+    store_cached_results,
+    prune_cached_results
+)
+from metrics import timer, count
+
+_STOP = object()
+
+
+class AnalysisWriter:
+    """
+    submit() only builds the row and queues it. One background thread
+    writes queued rows with executemany, one transaction per batch,
+    as soon as max_batch rows are waiting or the oldest has waited
+    flush_seconds. Result cache entries and prunes share the queue.
+    flush() and close() block until queued rows are on disk; close()
+    runs at interpreter exit.
+    """
+
+    def __init__(self, max_batch=ANALYSIS_WRITER_BATCH,
+                 flush_seconds=ANALYSIS_WRITER_FLUSH_SECONDS,
+                 max_queue=ANALYSIS_WRITER_QUEUE):
+        self.max_batch = max_batch
+        self.flush_seconds = flush_seconds
+
+        # Bounded: if the disk falls behind, callers block instead of
+        # the queue growing without limit
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+        self.written = 0
+        self.failed = 0
+
+    def submit(self, headers, body, result):
+        self._put(("analysis", analysis_row(headers, body, result)))
+
+    def submit_many(self, entries):
+        for headers, body, result in entries:
+            self.submit(headers, body, result)
+
+    def submit_cached(self, key, model_version, result, created_at):
+        # result must not be mutated after this; it is serialized later
+        self._put(("cache", (key, model_version, result, created_at)))
+
+    def prune_cached(self, min_created_at, model_version):
+        self._put(("prune", (min_created_at, model_version)))
+
+    def flush(self, timeout=None):
+        """
+        Block until everything submitted so far has been written
+        """
+
+        if self._thread is None:
+            return True
+        if self._closed:
+            # Nobody would answer an Event now; close() drains the queue
+            # and later writes are synchronous, so wait for the drain
+            self._thread.join(timeout)
+            return not self._thread.is_alive()
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=None):
+        with self._start_lock:
+            if self._closed:
+                return
+            self._closed = True
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def _put(self, row):
+        if self._closed:
+            # Late writes during shutdown go straight to the database
+            self._write([row])
+            return
+        self._ensure_started()
+        self._queue.put(row)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="analysis-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        rows = []
+        deadline = None
+
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is None or item is _STOP or isinstance(item, threading.Event):
+                self._write(rows)
+                rows, deadline = [], None
+                if isinstance(item, threading.Event):
+                    item.set()
+                elif item is _STOP:
+                    self._drain()
+                    return
+                continue
+
+            rows.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_seconds
+            if len(rows) >= self.max_batch:
+                self._write(rows)
+                rows, deadline = [], None
+
+    def _drain(self):
+        # Rows that raced with close() are still written
+        rows, waiters = [], []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+            elif item is not _STOP:
+                rows.append(item)
+        self._write(rows)
+        for waiter in waiters:
+            waiter.set()
+
+    def _write(self, items):
+        if not items:
+            return
+
+        rows = [row for kind, row in items if kind == "analysis"]
+        if rows:
+            try:
+                with timer("db_write"):
+                    insert_analysis_rows(rows)
+                self.written += len(rows)
+                count("decepta_analysis_rows_total", len(rows), outcome="written")
+            except Exception as e:
+                self.failed += len(rows)
+                count("decepta_analysis_rows_total", len(rows), outcome="failed")
+                print(f"[WARN] Failed to write {len(rows)} analysis rows: {e}", file=sys.stderr)
+
+        entries = [entry for kind, entry in items if kind == "cache"]
+        prunes = [args for kind, args in items if kind == "prune"]
+        try:
+            with timer("db_write"):
+                store_cached_results(entries)
+                for min_created_at, model_version in prunes:
+                    prune_cached_results(min_created_at, model_version)
+        except Exception as e:
+            # Only a cache: the entries stay in memory, lookups miss the rest
+            print(f"[WARN] Failed to write {len(entries)} result cache entries: {e}", file=sys.stderr)
+
+
+_analysis_writer = AnalysisWriter()
+atexit.register(_analysis_writer.close)
+
+def get_analysis_writer() -> AnalysisWriter:
+    return _analysis_writer
+
+def queue_analysis(headers, body, result):
+    _analysis_writer.submit(headers, body, result)
@@ -1,31 +1,45 @@
-from flask import Flask, render_template, request, redirect, url_for, session
-import os
+from flask import Flask, Response, render_template, request, redirect, url_for, session, jsonify, g
+from datetime import datetime, timedelta
+import base64
+import binascii
 
-from eml_parser import parse_eml
-from module3_runner import run_module_3
+from eml_parser import parse_eml_stream, parse_eml_headers
+from module3_runner import run_module_3_parsed, run_module_3_batch
 from voice_runner import run_voice_analysis
+from model_registry import warm_up, model_report
+from config import MODEL_WARMUP, API_MAX_MESSAGES, MAX_REQUEST_BYTES
 
 from database import (
-    init_db,
-    init_user_table,
-    init_exception_table,
-    save_analysis,
-    create_user,
-    authenticate_user,
-    add_exception,
-    is_exception
+    migrate,
+    release_connection,
+    api_token_user,
+    top_risky_domains,
+    decision_counts,
+    signal_counts
 )
+from login_security import authenticate_user, register_user, LoginThrottled, HashPoolBusy
+from exception_cache import is_sender_allowed, allow_sender
+from analysis_writer import queue_analysis
+from jobs import submit_job, get_job, QueueFull
+from uploads import receive_upload, discard_upload
+from metrics import metrics_enabled, render_metrics, collect_timings
 
 
 app = Flask(__name__)
 app.secret_key = "hackathon-secret-key"
+app.config["MAX_CONTENT_LENGTH"] = MAX_REQUEST_BYTES
 
-UPLOAD_FOLDER = "uploads"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+migrate()
 
-init_db()
-init_user_table()
-init_exception_table()
+if MODEL_WARMUP:
+    warm_up(background=True)
+
+
+@app.teardown_request
+def release_db_connection(exc):
+    # The dev server runs each request on a new thread; hand its
+    # connection to the idle pool for the next one
+    release_connection()
 
 
 def login_required(func):
@@ -36,6 +50,18 @@ def login_required(func):
     wrapper.__name__ = func.__name__
     return wrapper
 
+def api_token_required(func):
+    def wrapper(*args, **kwargs):
+        auth = request.headers.get("Authorization", "")
+        scheme, _, token = auth.partition(" ")
+        user = api_token_user(token.strip()) if scheme.lower() == "bearer" and token else None
+        if user is None:
+            return jsonify({"error": "missing or invalid API token"}), 401
+        g.api_user = user
+        return func(*args, **kwargs)
+    wrapper.__name__ = func.__name__
+    return wrapper
+
 @app.route("/login", methods=["GET", "POST"])
 def login():
     error = None
@@ -44,11 +70,13 @@ def login():
         email = request.form.get("email")
         password = request.form.get("password")
 
-        if authenticate_user(email, password):
-            session["user"] = email
-            return redirect(url_for("index"))
-        else:
+        try:
+            if authenticate_user(email, password, request.remote_addr):
+                session["user"] = email
+                return redirect(url_for("index"))
             error = "Invalid email or password"
+        except (LoginThrottled, HashPoolBusy) as e:
+            error = str(e)
 
     return render_template("login.html", error=error)
 
@@ -61,10 +89,12 @@ def register():
         email = request.form.get("email")
         password = request.form.get("password")
 
-        if create_user(email, password):
-            return redirect(url_for("login"))
-        else:
+        try:
+            if register_user(email, password, request.remote_addr):
+                return redirect(url_for("login"))
             error = "User already exists"
+        except (LoginThrottled, HashPoolBusy) as e:
+            error = str(e)
 
     return render_template("register.html", error=error)
 
@@ -74,83 +104,56 @@ def logout():
     session.clear()
     return redirect(url_for("login"))
 
+@app.route("/models")
+@login_required
+def models():
+    return jsonify(model_report())
+
+@app.route("/metrics")
+def metrics():
+    # Scraped by Prometheus, so no session is required
+    if not metrics_enabled():
+        return jsonify({"error": "metrics are disabled"}), 404
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
 @app.route("/add_exception", methods=["POST"])
 @login_required
 def add_sender_exception():
     sender = request.form.get("sender")
     if sender:
-        add_exception(session["user"], sender)
+        allow_sender(session["user"], sender)
     return redirect(url_for("index"))
 
 @app.route("/", methods=["GET", "POST"])
 @login_required
 def index():
-    result = None
-    email_preview = None
-    dashboard = None
-
     if request.method == "POST":
         file = request.files.get("eml_file")
 
         if file and file.filename.endswith(".eml"):
-            path = os.path.join(UPLOAD_FOLDER, file.filename)
-            file.save(path)
+            upload = receive_upload(file)
+            return submit_or_fail("email", analyze_email_upload, upload, session["user"], upload)
 
-            headers, body = parse_eml(path)
-            sender = headers.get("from", "")
+    result = None
+    email_preview = None
+    dashboard = None
+    job = None
 
-            email_preview = {
-                "from": sender,
-                "to": headers.get("to", ""),
-                "subject": headers.get("subject", ""),
-                "body": body
-            }
-            if is_exception(session["user"], sender):
-                result = {
-                    "nlp_analysis": {
-                        "detected_cues": [],
-                        "phishing_score": 0.0,
-                        "top_intent": "trusted sender",
-                        "confidence": "high"
-                    },
-                    "behavioral_analysis": {
-                        "behavioral_flags": [],
-                        "behavioral_score": 0.0
-                    },
-                    "decision_engine": {
-                        "decision": "ALLOW",
-                        "final_risk_score": 0.0,
-                        "user_explanation": [
-                            "Marked as exception by the user."
-                        ]
-                    }
-                }
-            else:
-                result = run_module_3(path)
-
-            save_analysis(headers, body, result)
-
-            dashboard = {
-                "nlp": {
-                    "Urgency Language": "urgency" in result["nlp_analysis"]["detected_cues"],
-                    "Authority Impersonation": "authority_impersonation" in result["nlp_analysis"]["detected_cues"],
-                    "Credential Request": "credential_request" in result["nlp_analysis"]["detected_cues"],
-                    "Action Forcing": "action_request" in result["nlp_analysis"]["detected_cues"]
-                },
-                "behavioral": {
-                    "From / Reply-To Mismatch":
-                        "from_reply_to_mismatch" in result["behavioral_analysis"]["behavioral_flags"],
-                    "Suspicious Links":
-                        any(flag in result["behavioral_analysis"]["behavioral_flags"]
-                            for flag in ["shortened_url", "ip_based_link"])
-                }
-            }
+    job_id = request.args.get("job")
+    if job_id:
+        job = get_job(job_id, session["user"])
+        if job is not None and job["status"] == "done":
+            result = job["result"]["result"]
+            email_preview = job["result"]["email_preview"]
+            dashboard = job["result"]["dashboard"]
 
     return render_template(
         "index.html",
         result=result,
         email_preview=email_preview,
         dashboard=dashboard,
+        job=job,
+        job_id=job_id,
         user=session["user"]
     )
 
@@ -162,10 +165,198 @@ def voice():
     if not file:
         return redirect(url_for("index"))
 
-    path = os.path.join(UPLOAD_FOLDER, file.filename)
-    file.save(path)
+    upload = receive_upload(file)
+    return submit_or_fail("voice", analyze_voice_upload, upload, upload)
 
-    transcript, result = run_voice_analysis(path)
+@app.route("/jobs/<job_id>")
+@login_required
+def job_status(job_id):
+    job = get_job(job_id, session["user"])
+    if job is None:
+        return jsonify({"error": "unknown or expired job"}), 404
+
+    return jsonify({
+        "id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "error": job["error"],
+        "result": job["result"]["result"] if job["status"] == "done" else None
+    })
+
+
+# ======================================================
+# JSON API
+# ======================================================
+
+@app.route("/api/v1/analyze", methods=["POST"])
+@api_token_required
+def api_analyze():
+    """
+    Analyze EML messages in memory. Accepts either
+    - a raw message body (message/rfc822 or application/octet-stream),
+      answered with one result object, or
+    - {"messages": [base64, ...]} as JSON, or several multipart files
+      under "eml", answered with {"results": [...]} in input order.
+    """
+
+    single = False
+
+    if request.is_json:
+        payload = request.get_json(silent=True) or {}
+        encoded = payload.get("messages")
+        if not isinstance(encoded, list):
+            return jsonify({"error": "expected {\"messages\": [base64, ...]}"}), 400
+        try:
+            messages = [base64.b64decode(m, validate=True) for m in encoded]
+        except (binascii.Error, TypeError, ValueError):
+            return jsonify({"error": "messages must be base64-encoded EML"}), 400
+    elif request.files:
+        messages = [f.read() for f in request.files.getlist("eml")]
+    else:
+        messages = [request.get_data()]
+        single = True
+
+    if not messages or not any(messages):
+        return jsonify({"error": "no messages supplied"}), 400
+    if len(messages) > API_MAX_MESSAGES:
+        return jsonify({"error": f"at most {API_MAX_MESSAGES} messages per request"}), 413
+
+    results = []
+    for index, analyzed in enumerate(run_module_3_batch(messages)):
+        if "error" in analyzed:
+            results.append({"index": index, "error": analyzed["error"]})
+            continue
+
+        headers = analyzed.pop("headers")
+        body = analyzed.pop("body")
+        queue_analysis(headers, body, analyzed)
+
+        results.append({
+            "index": index,
+            "from": headers.get("from", ""),
+            "subject": headers.get("subject", ""),
+            **analyzed
+        })
+
+    return jsonify(results[0] if single else {"results": results})
+
+
+# ======================================================
+# ANALYTICS
+# ======================================================
+
+def analytics_since(default_days, max_days=366):
+    days = min(max(request.args.get("days", default_days, type=int), 1), max_days)
+    # Rollup buckets are UTC ISO prefixes, like email_analysis.created_at
+    return datetime.utcnow() - timedelta(days=days - 1), days
+
+@app.route("/analytics/top-domains")
+@login_required
+def analytics_top_domains():
+    since, days = analytics_since(7)
+    limit = min(max(request.args.get("limit", 10, type=int), 1), 100)
+    return jsonify({
+        "days": days,
+        "domains": top_risky_domains(since.strftime("%Y-%m-%d"), limit)
+    })
+
+@app.route("/analytics/decisions")
+@login_required
+def analytics_decisions():
+    granularity = request.args.get("granularity", "day")
+    if granularity not in ("hour", "day"):
+        return jsonify({"error": "granularity must be 'hour' or 'day'"}), 400
+
+    since, days = analytics_since(1 if granularity == "hour" else 30)
+    since_bucket = since.strftime("%Y-%m-%dT00" if granularity == "hour" else "%Y-%m-%d")
+    return jsonify({
+        "granularity": granularity,
+        "days": days,
+        "series": decision_counts(granularity, since_bucket)
+    })
+
+@app.route("/analytics/cues")
+@login_required
+def analytics_cues():
+    since, days = analytics_since(7)
+    since_day = since.strftime("%Y-%m-%d")
+    return jsonify({
+        "days": days,
+        "cues": signal_counts("cue", since_day),
+        "behavioral_flags": signal_counts("flag", since_day)
+    })
+
+
+# ======================================================
+# UPLOAD JOBS
+# ======================================================
+
+def submit_or_fail(kind, func, upload, *args):
+    try:
+        job_id = submit_job(kind, session["user"], with_upload_cleanup, func, upload, *args)
+    except QueueFull:
+        discard_upload(upload)
+        return "The analysis queue is full, please retry shortly.", 503
+    return redirect(url_for("index", job=job_id))
+
+def with_upload_cleanup(func, upload, *args):
+    try:
+        return func(*args)
+    finally:
+        discard_upload(upload)
+
+def analyze_email_upload(user, upload):
+    with collect_timings() as timings:
+        # Allowlist check needs the From header only
+        trusted = is_sender_allowed(user, parse_eml_headers(upload).get("from", ""))
+
+        parsed = parse_eml_stream(upload)
+        headers, body = parsed["headers"], parsed["body"]
+        sender = headers.get("from", "")
+
+        email_preview = {
+            "from": sender,
+            "to": headers.get("to", ""),
+            "subject": headers.get("subject", ""),
+            "body": body
+        }
+        if trusted:
+            result = {
+                "nlp_analysis": {
+                    "detected_cues": [],
+                    "phishing_score": 0.0,
+                    "top_intent": "trusted sender",
+                    "confidence": "high"
+                },
+                "behavioral_analysis": {
+                    "behavioral_flags": [],
+                    "behavioral_score": 0.0
+                },
+                "decision_engine": {
+                    "decision": "ALLOW",
+                    "final_risk_score": 0.0,
+                    "user_explanation": [
+                        "Marked as exception by the user."
+                    ]
+                },
+                # One user's allowlist says nothing about the sender globally
+                "reputation_input": False
+            }
+        else:
+            result = run_module_3_parsed(parsed)
+        if timings is not None:
+            result["timings"] = timings.as_dict()
+
+    queue_analysis(headers, body, result)
+
+    return {
+        "result": result,
+        "email_preview": email_preview,
+        "dashboard": build_dashboard(result)
+    }
+
+def analyze_voice_upload(upload):
+    transcript, result = run_voice_analysis(upload)
 
     email_preview = {
         "from": "Voice Call",
@@ -174,6 +365,13 @@ def voice():
         "body": transcript
     }
 
+    return {
+        "result": result,
+        "email_preview": email_preview,
+        "dashboard": build_dashboard(result, behavioral=False)
+    }
+
+def build_dashboard(result, behavioral=True):
     dashboard = {
         "nlp": {
             "Urgency Language": "urgency" in result["nlp_analysis"]["detected_cues"],
@@ -184,13 +382,16 @@ def voice():
         "behavioral": {}
     }
 
-    return render_template(
-        "index.html",
-        result=result,
-        email_preview=email_preview,
-        dashboard=dashboard,
-        user=session["user"]
-    )
+    if behavioral:
+        dashboard["behavioral"] = {
+            "From / Reply-To Mismatch":
+                "from_reply_to_mismatch" in result["behavioral_analysis"]["behavioral_flags"],
+            "Suspicious Links":
+                any(flag in result["behavioral_analysis"]["behavioral_flags"]
+                    for flag in ["shortened_url", "ip_based_link"])
+        }
+
+    return dashboard
 
 if __name__ == "__main__":
     app.run(debug=True)
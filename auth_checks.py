@@ -1,31 +1,61 @@
 import re
 
+# Every "method=result" token in an (ARC-)Authentication-Results value,
+# found in a single pass over all instances of both headers
+AUTH_RESULT_PATTERN = re.compile(
+    r"(?<![\w.-])(spf|dkim|dmarc)\s*=\s*([a-z]+)",
+    re.IGNORECASE
+)
+
+AUTH_METHODS = ("spf", "dkim", "dmarc")
+
+# Added to auth_risk_score per flag
+AUTH_FLAG_WEIGHTS = {
+    "spf_fail": 0.2,
+    "spf_softfail": 0.1,
+    "dkim_fail": 0.2,
+    "dmarc_fail": 0.3
+}
+
 class EmailAuthAnalyzer:
     def __init__(self):
         pass
 
     def analyze(self, headers):
-        auth_results = headers.get("arc-authentication-results", "")
-        auth_results = auth_results.lower() if auth_results else ""
+        """
+        SPF / DKIM / DMARC results for a message. Results stamped by
+        the receiving server (the first Authentication-Results that
+        mentions a method) win; ARC-Authentication-Results only fill
+        in methods it does not report, e.g. for forwarded mail.
+        """
 
-        spf = self._extract_result(auth_results, "spf")
-        dkim = self._extract_result(auth_results, "dkim")
-        dmarc = self._extract_result(auth_results, "dmarc")
+        results = self._first_results(headers.get("authentication-results", ""))
+        for method, result in self._first_results(
+                headers.get("arc-authentication-results", "")).items():
+            results.setdefault(method, result)
+
+        spf = results.get("spf", "unknown")
+        dkim = results.get("dkim", "unknown")
+        dmarc = results.get("dmarc", "unknown")
 
         risk_flags = []
-        score = 0.0
 
         if spf == "fail":
             risk_flags.append("spf_fail")
-            score += 0.2
+        elif spf == "softfail":
+            risk_flags.append("spf_softfail")
 
         if dkim == "fail":
             risk_flags.append("dkim_fail")
-            score += 0.2
 
         if dmarc == "fail":
             risk_flags.append("dmarc_fail")
-            score += 0.3
+
+        score = sum((AUTH_FLAG_WEIGHTS[flag] for flag in risk_flags), 0.0)
+
+        # A DMARC failure, or SPF and DKIM both failing, means the From
+        # domain is forged: conclusive without the classifier
+        forged = dmarc == "fail" or (spf == "fail" and dkim == "fail")
 
         return {
             "auth_results": {
@@ -33,10 +63,39 @@ class EmailAuthAnalyzer:
                 "dkim": dkim,
                 "dmarc": dmarc
             },
-            "auth_risk_score": min(score, 1.0),
-            "auth_flags": risk_flags
+            "auth_risk_score": round(min(score, 1.0), 2),
+            "auth_flags": risk_flags,
+            "auth_verdict": "fail" if forged else (
+                "pass" if dmarc == "pass" else "unknown"
+            )
         }
 
-    def _extract_result(self, text, key):
-        match = re.search(rf"{key}=(pass|fail|none)", text)
-        return match.group(1) if match else "unknown"
+    def _first_results(self, values):
+        """
+        {method: result} from a header value, or from several instances
+        joined by newlines (topmost first). Within one instance a method
+        passes if any of its results pass (several DKIM signatures).
+        """
+
+        found = {}
+        if not values:
+            return found
+
+        for value in values.split("\n"):
+            instance = {}
+            for method, result in AUTH_RESULT_PATTERN.findall(value):
+                method = method.lower()
+                result = result.lower()
+                if method not in instance or result == "pass":
+                    instance[method] = result
+            for method, result in instance.items():
+                found.setdefault(method, result)
+            if len(found) == len(AUTH_METHODS):
+                break
+
+        return found
+
+_auth_analyzer = EmailAuthAnalyzer()
+
+def run_auth_checks(headers: dict) -> dict:
+    return _auth_analyzer.analyze(headers)
@@ -0,0 +1,84 @@
+# ======================================================
+# BACKEND PARITY CHECK
+# Compare quantized / ONNX scores against the fp32 backend
+# ======================================================
+
+import argparse
+import glob
+import sys
+import time
+
+from eml_parser import parse_eml
+from text_builder import assemble_email_text
+from nlp_engine import PhishingNLPModule, BACKENDS
+
+
+def load_sample_texts(pattern):
+    texts = []
+    for path in sorted(glob.glob(pattern)):
+        headers, body = parse_eml(path)
+        texts.append((path, assemble_email_text(headers, body)[0]))
+    return texts
+
+
+def time_backend(engine, texts):
+    started = time.perf_counter()
+    scores = engine.classify_batch(texts)
+    return scores, time.perf_counter() - started
+
+
+def compare(reference, candidate):
+    """
+    Max absolute per-label score difference and top-label agreement
+    """
+
+    max_diff = 0.0
+    agree = 0
+    for ref, cand in zip(reference, candidate):
+        max_diff = max(max_diff, max(abs(ref[label] - cand[label]) for label in ref))
+        if max(ref, key=ref.get) == max(cand, key=cand.get):
+            agree += 1
+    return max_diff, agree
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check NLP backend parity against fp32")
+    parser.add_argument("--samples", default="samples/*.eml")
+    parser.add_argument("--backends", nargs="+", default=["torch-int8", "onnx"],
+                        choices=[b for b in BACKENDS if b != "torch"])
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="max allowed per-label score difference")
+    args = parser.parse_args()
+
+    samples = load_sample_texts(args.samples)
+    if not samples:
+        print(f"No samples match {args.samples}")
+        return 1
+    texts = [text for _, text in samples]
+
+    reference_engine = PhishingNLPModule(backend="torch")
+    # First call pays one-off warm-up costs, keep it out of the timing
+    reference_engine.classify_batch(texts[:1])
+    reference, ref_seconds = time_backend(reference_engine, texts)
+    print(f"torch       {ref_seconds * 1000:8.1f} ms  (reference)")
+
+    failed = False
+    for backend in args.backends:
+        engine = PhishingNLPModule(backend=backend)
+        engine.classify_batch(texts[:1])
+        scores, seconds = time_backend(engine, texts)
+        max_diff, agree = compare(reference, scores)
+
+        ok = max_diff <= args.tolerance and agree == len(texts)
+        failed = failed or not ok
+        print(
+            f"{backend:<11} {seconds * 1000:8.1f} ms  "
+            f"max |diff| {max_diff:.4f}  top-label agreement {agree}/{len(texts)}  "
+            f"{'OK' if ok else 'FAIL'}"
+        )
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+# ======================================================
+# BATCH SCANNER
+# Back-scan a directory of .eml files, an mbox or a Maildir
+# ======================================================
+
+import argparse
+import json
+import mailbox
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from eml_parser import parse_eml_stream
+from module3_runner import prepare_email, analyze_prepared, has_email_headers
+from database import migrate, extract_sender_domain
+from analysis_writer import get_analysis_writer
+
+_SENTINEL = None
+
+
+# ======================================================
+# MESSAGE SOURCES
+# ======================================================
+
+def iter_messages(path):
+    """
+    Yield (source_id, raw_bytes) for every message under `path`:
+    a Maildir, a directory tree of .eml files, a single .eml or an mbox
+    """
+
+    if os.path.isdir(path):
+        if all(os.path.isdir(os.path.join(path, sub)) for sub in ("cur", "new", "tmp")):
+            box = mailbox.Maildir(path, factory=None, create=False)
+            for key in box.iterkeys():
+                yield f"{path}#{key}", box.get_bytes(key)
+            return
+
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                if name.lower().endswith(".eml"):
+                    file_path = os.path.join(root, name)
+                    with open(file_path, "rb") as f:
+                        yield file_path, f.read()
+        return
+
+    if path.lower().endswith(".eml"):
+        with open(path, "rb") as f:
+            yield path, f.read()
+        return
+
+    box = mailbox.mbox(path, factory=None, create=False)
+    for key in box.iterkeys():
+        yield f"{path}#{key}", box.get_bytes(key)
+
+
+# ======================================================
+# WORKER-PROCESS STAGE
+# ======================================================
+
+def prepare_message(item):
+    """
+    Parsing and regex work, run in the process pool
+    """
+
+    source_id, raw = item
+    try:
+        parsed = parse_eml_stream(raw)
+        if not has_email_headers(parsed["headers"]):
+            return {"source": source_id, "error": "no From, To or Subject header found"}
+        prepared = prepare_email(parsed["headers"], parsed["body"], parsed["links"])
+    except Exception as e:
+        return {"source": source_id, "error": f"{type(e).__name__}: {e}"}
+
+    prepared["source"] = source_id
+    return prepared
+
+
+# ======================================================
+# SCANNER
+# ======================================================
+
+class BatchScanner:
+    """
+    Parses messages across a process pool and hands them, in batches,
+    to a single inference thread that runs batched NLP, writes JSONL
+    and bulk-inserts into email_analysis.
+    """
+
+    def __init__(self, output_path, workers=None, batch_size=32,
+                 save_to_db=True, progress_every=2.0):
+        self.output_path = output_path
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.save_to_db = save_to_db
+        self.progress_every = progress_every
+
+        # Bounded so parsing cannot run arbitrarily far ahead of inference
+        self._batches = queue.Queue(maxsize=4)
+
+        self.parsed = 0
+        self.analyzed = 0
+        self.failed = 0
+        self.db_failed = 0
+        self.decisions = {}
+
+    def scan(self, path):
+        """
+        Scan every message under `path`. Raises OSError before any
+        parsing starts if the output file cannot be opened.
+        """
+
+        out = open(self.output_path, "a", encoding="utf-8")
+        if self.save_to_db:
+            try:
+                migrate()
+            except Exception:
+                out.close()
+                raise
+
+        started = time.perf_counter()
+        inference = threading.Thread(target=self._inference_worker, args=(started, out))
+        inference.start()
+
+        try:
+            batch = []
+            for prepared in self._parse_all(path):
+                self.parsed += 1
+                if "error" in prepared:
+                    self.failed += 1
+                    self._write_error(prepared)
+                    continue
+
+                batch.append(prepared)
+                if len(batch) >= self.batch_size:
+                    self._batches.put(batch)
+                    batch = []
+
+            if batch:
+                self._batches.put(batch)
+        finally:
+            self._batches.put(_SENTINEL)
+            inference.join()
+            if self.save_to_db:
+                get_analysis_writer().flush()
+
+        elapsed = time.perf_counter() - started
+        self._report(elapsed, final=True)
+        return {
+            "messages": self.parsed,
+            "analyzed": self.analyzed,
+            "failed": self.failed,
+            "db_failed": self.db_failed,
+            "decisions": self.decisions,
+            "seconds": round(elapsed, 2),
+            "messages_per_second": round(self.analyzed / elapsed, 1) if elapsed else 0.0
+        }
+
+    def _parse_all(self, path):
+        # Keep a bounded number of messages in flight so huge mailboxes
+        # are streamed rather than loaded up front
+        max_in_flight = self.workers * 8
+        messages = iter_messages(path)
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            in_flight = set()
+            exhausted = False
+
+            while in_flight or not exhausted:
+                while not exhausted and len(in_flight) < max_in_flight:
+                    item = next(messages, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    in_flight.add(pool.submit(prepare_message, item))
+
+                if not in_flight:
+                    break
+
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+    def _inference_worker(self, started, out):
+        last_report = time.perf_counter()
+
+        try:
+            while True:
+                batch = self._batches.get()
+                if batch is _SENTINEL:
+                    break
+
+                # Any failure skips the batch and keeps draining, so the
+                # parser side never blocks on a dead consumer
+                try:
+                    self._finish_batch(batch, out)
+                except Exception as e:
+                    self.failed += len(batch)
+                    print(f"[WARN] Batch of {len(batch)} failed: {e}", file=sys.stderr)
+                    continue
+
+                now = time.perf_counter()
+                if now - last_report >= self.progress_every:
+                    self._report(now - started)
+                    last_report = now
+        finally:
+            out.close()
+
+    def _finish_batch(self, batch, out):
+        results = analyze_prepared(batch)
+
+        lines = []
+        for prepared, result in zip(batch, results):
+            lines.append(json.dumps({
+                "source": prepared["source"],
+                "email_hash": prepared["email_hash"],
+                "sender_domain": extract_sender_domain(prepared["headers"]),
+                "subject": prepared["headers"].get("subject", ""),
+                **result
+            }) + "\n")
+        out.writelines(lines)
+
+        for result in results:
+            decision = result["decision_engine"]["decision"]
+            self.decisions[decision] = self.decisions.get(decision, 0) + 1
+        self.analyzed += len(batch)
+
+        if self.save_to_db:
+            # The JSONL lines are already written, so a database failure
+            # leaves the batch analyzed and is counted on its own
+            try:
+                get_analysis_writer().submit_many(
+                    (prepared["headers"], prepared["body"], result)
+                    for prepared, result in zip(batch, results)
+                )
+            except Exception as e:
+                self.db_failed += len(batch)
+                print(f"[WARN] Database insert of {len(batch)} failed: {e}", file=sys.stderr)
+
+    def _write_error(self, prepared):
+        print(f"[WARN] {prepared['source']}: {prepared['error']}", file=sys.stderr)
+
+    def _report(self, elapsed, final=False):
+        rate = self.analyzed / elapsed if elapsed else 0.0
+        print(
+            f"[{'DONE' if final else 'SCAN'}] parsed {self.parsed}  "
+            f"analyzed {self.analyzed}  failed {self.failed}  "
+            f"db_failed {self.db_failed}  "
+            f"{rate:.1f} msg/s  {elapsed:.1f}s",
+            file=sys.stderr
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Scan a directory of .eml files, an mbox file or a Maildir"
+    )
+    parser.add_argument("path")
+    parser.add_argument("-o", "--output", default="scan_results.jsonl",
+                        help="JSONL file to append results to")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="parser processes (default: CPU count)")
+    parser.add_argument("-b", "--batch-size", type=int, default=32,
+                        help="messages per NLP batch")
+    parser.add_argument("--no-db", action="store_true",
+                        help="do not write into email_analysis")
+    args = parser.parse_args()
+
+    scanner = BatchScanner(
+        args.output,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        save_to_db=not args.no_db
+    )
+    try:
+        summary = scanner.scan(args.path)
+    except OSError as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+# ======================================================
+# SYNTHETIC EML CORPUS
+# python -m benchmarks.corpus OUT_DIR [-n N] [--seed S]
+# ======================================================
+
+import argparse
+import os
+import random
+from email.message import EmailMessage
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+KINDS = ("plain", "multipart", "html", "attachments", "links", "long")
+
+SENDER_DOMAINS = [
+    "shop.example.com", "billing.example.net", "secure-bank.example.org",
+    "hr.example.com", "it-support.example.io", "gmail.com"
+]
+
+SUBJECTS = [
+    "Your order has shipped", "Invoice for last month", "Team offsite agenda",
+    "Action required: verify your account", "Password expires today",
+    "Quarterly report", "Final warning: account suspended"
+]
+
+FILLER = (
+    "thanks for shopping with us your order has shipped and the invoice "
+    "is attached please let us know if anything is missing from the parcel "
+    "we appreciate your business and look forward to seeing you again the "
+    "meeting notes from tuesday are in the shared folder as discussed"
+).split()
+
+PHISHING = [
+    "your account has been suspended", "verify your password immediately",
+    "contact the security team", "click here to reset your login",
+    "enter the verification code", "final warning from the bank"
+]
+
+LINK_HOSTS = [
+    "example.com", "login.example-secure.net", "192.168.10.24",
+    "bit.ly", "docs.example.org"
+]
+
+AUTH_RESULTS = [
+    "mx.example.com; spf=pass smtp.mailfrom={d}; dkim=pass header.d={d}; dmarc=pass",
+    "mx.example.com; spf=softfail smtp.mailfrom={d}; dkim=none; dmarc=none",
+    "mx.example.com; spf=fail smtp.mailfrom={d}; dkim=fail header.d={d}; dmarc=fail"
+]
+
+
+def _sentence(rng, words, phishing_ratio):
+    tokens = [rng.choice(FILLER) for _ in range(words)]
+    if rng.random() < phishing_ratio:
+        for phrase in rng.sample(PHISHING, 2):
+            tokens.insert(rng.randrange(len(tokens)), phrase)
+    return " ".join(tokens)
+
+
+def _paragraphs(rng, count, words, phishing_ratio):
+    return "\n\n".join(_sentence(rng, words, phishing_ratio) for _ in range(count))
+
+
+def _url(rng):
+    return f"http://{rng.choice(LINK_HOSTS)}/{rng.randrange(10**6):06d}"
+
+
+def _base_message(rng, index):
+    domain = rng.choice(SENDER_DOMAINS)
+    sent = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=index * 7)
+
+    msg = EmailMessage()
+    msg["From"] = f"sender{rng.randrange(1000)}@{domain}"
+    msg["To"] = "user@example.com"
+    msg["Subject"] = rng.choice(SUBJECTS)
+    msg["Date"] = format_datetime(sent)
+    msg["Message-ID"] = f"<bench-{index}@{domain}>"
+    msg["Authentication-Results"] = rng.choice(AUTH_RESULTS).format(d=domain)
+    if rng.random() < 0.2:
+        msg["Reply-To"] = f"reply@{rng.choice(SENDER_DOMAINS)}"
+    return msg
+
+
+def make_plain(rng, index, phishing_ratio):
+    msg = _base_message(rng, index)
+    msg.set_content(_paragraphs(rng, 3, 60, phishing_ratio))
+    return msg
+
+
+def make_multipart(rng, index, phishing_ratio):
+    msg = _base_message(rng, index)
+    text = _paragraphs(rng, 3, 60, phishing_ratio)
+    msg.set_content(text)
+    msg.add_alternative(
+        "<html><body>" + "".join(f"<p>{p}</p>" for p in text.split("\n\n")) + "</body></html>",
+        subtype="html"
+    )
+    return msg
+
+
+def make_html(rng, index, phishing_ratio):
+    # HTML-only, markup-heavy, links hidden behind anchor text
+    msg = _base_message(rng, index)
+    rows = "".join(
+        f"<tr><td style='padding:4px;font-family:Arial'><span>{_sentence(rng, 25, phishing_ratio)}</span>"
+        f" <a href='{_url(rng)}'>view details</a></td></tr>"
+        for _ in range(40)
+    )
+    msg.set_content(
+        f"<html><head><style>td {{color: #333}}</style></head><body><table>{rows}</table></body></html>",
+        subtype="html"
+    )
+    return msg
+
+
+def make_attachments(rng, index, phishing_ratio):
+    msg = _base_message(rng, index)
+    msg.set_content(_paragraphs(rng, 2, 40, phishing_ratio))
+    for n in range(rng.randint(2, 4)):
+        msg.add_attachment(
+            rng.randbytes(rng.randint(64, 512) * 1024),
+            maintype="application", subtype="pdf",
+            filename=f"document-{n}.pdf"
+        )
+    return msg
+
+
+def make_links(rng, index, phishing_ratio):
+    msg = _base_message(rng, index)
+    lines = [
+        f"{_sentence(rng, 12, phishing_ratio)} {_url(rng)}"
+        for _ in range(60)
+    ]
+    msg.set_content("\n".join(lines))
+    return msg
+
+
+def make_long(rng, index, phishing_ratio):
+    msg = _base_message(rng, index)
+    msg.set_content(_paragraphs(rng, 400, 80, phishing_ratio))
+    return msg
+
+
+BUILDERS = {
+    "plain": make_plain,
+    "multipart": make_multipart,
+    "html": make_html,
+    "attachments": make_attachments,
+    "links": make_links,
+    "long": make_long
+}
+
+
+def generate_corpus(count, seed=0, kinds=KINDS, phishing_ratio=0.3):
+    """
+    [(kind, raw bytes)] with kinds assigned round-robin. The same
+    count, seed and kinds always give byte-identical messages.
+    """
+
+    rng = random.Random(seed)
+    corpus = []
+    for index in range(count):
+        kind = kinds[index % len(kinds)]
+        msg = BUILDERS[kind](rng, index, phishing_ratio)
+        if msg.is_multipart():
+            # The email package picks random boundaries otherwise
+            msg.set_boundary(f"==bench-{seed}-{index}==")
+        corpus.append((kind, msg.as_bytes()))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic .eml corpus")
+    parser.add_argument("out_dir")
+    parser.add_argument("-n", type=int, default=120, help="messages to write")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--kinds", default=",".join(KINDS), help="comma separated")
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    corpus = generate_corpus(args.n, args.seed, tuple(args.kinds.split(",")))
+    for index, (kind, raw) in enumerate(corpus):
+        with open(os.path.join(args.out_dir, f"{index:05d}-{kind}.eml"), "wb") as f:
+            f.write(raw)
+    print(f"wrote {len(corpus)} messages to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
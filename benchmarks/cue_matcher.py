@@ -0,0 +1,108 @@
+# ======================================================
+# CUE MATCHER MICRO-BENCHMARK
+# python -m benchmarks.cue_matcher
+# ======================================================
+
+import argparse
+import random
+import re
+import time
+
+from benchmarks.corpus import FILLER, PHISHING
+from cue_engine import extract_cues, scan_cues
+
+URGENCY_WORDS = [
+    "urgent", "immediately", "within", "suspended",
+    "locked", "expire", "final warning", "action required"
+]
+
+CREDENTIAL_PATTERNS = [
+    r"password", r"otp", r"verification code",
+    r"login", r"credentials", r"pin"
+]
+
+
+def legacy_extract_linguistic_cues(text):
+    """
+    The substring / per-pattern implementation cue_engine replaced
+    """
+
+    cues = set()
+    lower = text.lower()
+
+    for word in URGENCY_WORDS:
+        if word in lower:
+            cues.add("urgency")
+
+    for pattern in CREDENTIAL_PATTERNS:
+        if re.search(pattern, lower):
+            cues.add("credential_request")
+
+    if re.search(r"admin|support|security team|bank|it desk", lower):
+        cues.add("authority_impersonation")
+
+    if re.search(r"click|verify|confirm|update|reset", lower):
+        cues.add("action_request")
+
+    return list(cues)
+
+
+def make_corpus(n, words, phishing_ratio, seed, words_per_cue=40):
+    """
+    Filler texts; the phishing share carries one cue phrase per
+    words_per_cue words (at least two), like a real phishing body
+    """
+
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(n):
+        tokens = [rng.choice(FILLER) for _ in range(words)]
+        if rng.random() < phishing_ratio:
+            for _ in range(max(words // words_per_cue, 2)):
+                tokens.insert(rng.randrange(len(tokens)), rng.choice(PHISHING))
+        corpus.append(" ".join(tokens))
+    return corpus
+
+
+def time_fn(fn, corpus, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in corpus:
+            fn(text)
+        best = min(best, time.perf_counter() - started)
+    return best / len(corpus)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cue extraction")
+    parser.add_argument("-n", type=int, default=2000, help="texts per corpus (fewer for long texts)")
+    parser.add_argument("--phishing-ratio", type=float, default=0.5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # "pipeline" is scan_cues(), categories plus offsets, which is what
+    # the rule stages run; the speedup column compares it to legacy
+    print(f"{'words':>6} {'legacy us':>10} {'categories us':>14} {'pipeline us':>12} {'speedup':>8}")
+    for words in (50, 300, 2000, 20000):
+        n = max(args.n * 50 // max(words, 50), 20)
+        corpus = make_corpus(n, words, args.phishing_ratio, args.seed)
+        legacy = time_fn(legacy_extract_linguistic_cues, corpus, args.repeat)
+        categories = time_fn(extract_cues, corpus, args.repeat)
+        pipeline = time_fn(scan_cues, corpus, args.repeat)
+        print(
+            f"{words:>6} {legacy * 1e6:>10.1f} {categories * 1e6:>14.1f} "
+            f"{pipeline * 1e6:>12.1f} {legacy / pipeline:>7.2f}x"
+        )
+
+    # Where the two disagree, show why (e.g. "pin" inside "shopping")
+    corpus = make_corpus(200, 100, args.phishing_ratio, args.seed)
+    differing = sum(
+        set(legacy_extract_linguistic_cues(t)) != set(extract_cues(t)) for t in corpus
+    )
+    print(f"\ncategory sets differ on {differing}/{len(corpus)} texts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+# ======================================================
+# PER-STAGE PIPELINE BENCHMARK
+# python -m benchmarks.stages [--stub-classifier] [-o out.json] [--baseline base.json]
+# ======================================================
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import database
+from benchmarks.corpus import KINDS, generate_corpus
+from config import NLP_BATCH_SIZE
+from cue_engine import scan_cues
+from eml_parser import parse_eml_stream
+from module2_behavioral import BehavioralAnalyzer
+from module3_decision_engine import DecisionEngine
+from nlp_engine import LABELS, PhishingNLPModule
+from text_builder import build_email_text
+
+STAGES = ("parse", "cues", "behavioral", "classifier", "decision", "save")
+
+
+class StubNLPModule(PhishingNLPModule):
+    """
+    No model weights: label scores are derived from a hash of the
+    text, so results are deterministic and the rest of the pipeline
+    sees realistic-looking input
+    """
+
+    def __init__(self):
+        self.labels = list(LABELS)
+        self.student = None
+
+    def classify_batch(self, texts: list) -> list:
+        results = []
+        for text in texts:
+            digest = hashlib.blake2b(text.encode("utf-8", "replace"), digest_size=len(self.labels)).digest()
+            total = sum(digest) or 1
+            results.append({label: b / total for label, b in zip(self.labels, digest)})
+        return results
+
+
+def peak_rss_mib():
+    # Process-wide high-water mark, so not attributable to one stage
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, KiB elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(q / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(latencies):
+    """
+    Per-message latencies (seconds) -> milliseconds and msg/s
+    """
+
+    ordered = sorted(latencies)
+    total = sum(ordered)
+    return {
+        "count": len(ordered),
+        "p50_ms": round(percentile(ordered, 50) * 1e3, 4),
+        "p95_ms": round(percentile(ordered, 95) * 1e3, 4),
+        "p99_ms": round(percentile(ordered, 99) * 1e3, 4),
+        "mean_ms": round(statistics.fmean(ordered) * 1e3, 4) if ordered else 0.0,
+        "throughput_per_s": round(len(ordered) / total, 1) if total else None
+    }
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    value = fn(*args)
+    return value, time.perf_counter() - started
+
+
+def run_stages(corpus, classifier, batch_size):
+    """
+    Runs every stage over the whole corpus before the next one, so each
+    stage's latencies are measured on their own
+    """
+
+    timings = {stage: [] for stage in STAGES}
+    behavioral = BehavioralAnalyzer()
+    engine = DecisionEngine()
+
+    parsed = []
+    for _, raw in corpus:
+        result, elapsed = timed(parse_eml_stream, raw)
+        parsed.append(result)
+        timings["parse"].append(elapsed)
+    stats = {"parse": summarize(timings["parse"])}
+
+    texts, windows = zip(*(build_email_text(p["headers"], p["body"]) for p in parsed))
+
+    for text in texts:
+        _, elapsed = timed(scan_cues, text)
+        timings["cues"].append(elapsed)
+    stats["cues"] = summarize(timings["cues"])
+
+    behavioral_results = []
+    for p in parsed:
+        result, elapsed = timed(behavioral.analyze, p["headers"], p["body"], p["links"])
+        behavioral_results.append(result)
+        timings["behavioral"].append(elapsed)
+    stats["behavioral"] = summarize(timings["behavioral"])
+
+    # Batched like the pipeline; each message is charged its share of the batch
+    nlp_results = []
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        results, elapsed = timed(classifier.analyze_windows, batch, windows[start:start + batch_size])
+        nlp_results.extend(results)
+        timings["classifier"].extend([elapsed / len(batch)] * len(batch))
+    stats["classifier"] = summarize(timings["classifier"])
+
+    decisions = []
+    for nlp_result, behavioral_result in zip(nlp_results, behavioral_results):
+        result, elapsed = timed(engine.decide, nlp_result, behavioral_result)
+        decisions.append(result)
+        timings["decision"].append(elapsed)
+    stats["decision"] = summarize(timings["decision"])
+
+    for p, nlp_result, behavioral_result, decision in zip(parsed, nlp_results, behavioral_results, decisions):
+        result = {
+            "nlp_analysis": nlp_result,
+            "behavioral_analysis": behavioral_result,
+            "decision_engine": decision
+        }
+        _, elapsed = timed(database.save_analysis, p["headers"], p["body"], result)
+        timings["save"].append(elapsed)
+    stats["save"] = summarize(timings["save"])
+
+    return stats
+
+
+def compare(current, baseline, tolerance):
+    """
+    [(stage, metric, baseline, current, ratio)] for every p50 / p95
+    that got more than `tolerance` slower than the baseline
+    """
+
+    regressions = []
+    for stage, stats in current["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if not base.get(metric):
+                continue
+            ratio = stats[metric] / base[metric]
+            if ratio > 1 + tolerance:
+                regressions.append((stage, metric, base[metric], stats[metric], ratio))
+    return regressions
+
+
+def print_table(report, baseline=None):
+    print(f"{'stage':<11} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'msg/s':>10} {'vs base p95':>12}")
+    for stage, stats in report["stages"].items():
+        delta = ""
+        base = (baseline or {}).get("stages", {}).get(stage)
+        if base and base.get("p95_ms"):
+            delta = f"{stats['p95_ms'] / base['p95_ms']:.2f}x"
+        print(
+            f"{stage:<11} {stats['p50_ms']:>9.3f} {stats['p95_ms']:>9.3f} {stats['p99_ms']:>9.3f} "
+            f"{stats['throughput_per_s'] or 0:>10.1f} {delta:>12}"
+        )
+    if report["meta"].get("peak_rss_mib") is not None:
+        print(f"\npeak RSS (whole run): {report['meta']['peak_rss_mib']:.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each email pipeline stage on a synthetic corpus")
+    parser.add_argument("-n", type=int, default=300, help="messages in the corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--kinds", default=",".join(KINDS), help="comma separated corpus kinds")
+    parser.add_argument("--stub-classifier", action="store_true",
+                        help="hash-based scores instead of the transformer (no model weights needed)")
+    parser.add_argument("--batch-size", type=int, default=NLP_BATCH_SIZE)
+    parser.add_argument("-o", "--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed p50 / p95 slowdown vs the baseline (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    kinds = tuple(args.kinds.split(","))
+    corpus = generate_corpus(args.n, args.seed, kinds)
+
+    classifier = StubNLPModule() if args.stub_classifier else PhishingNLPModule()
+
+    # save_analysis writes to a throwaway database, never the real one
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_NAME = os.path.join(tmp, "bench.db")
+        database.migrate()
+        try:
+            stages = run_stages(corpus, classifier, args.batch_size)
+        finally:
+            database.close_connection()
+
+    report = {
+        "meta": {
+            "messages": len(corpus),
+            "corpus_bytes": sum(len(raw) for _, raw in corpus),
+            "seed": args.seed,
+            "kinds": list(kinds),
+            "classifier": "stub" if args.stub_classifier else "transformer",
+            "batch_size": args.batch_size,
+            "peak_rss_mib": peak_rss_mib(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        },
+        "stages": stages
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print_table(report, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if baseline is not None:
+        if baseline.get("meta", {}).get("classifier") != report["meta"]["classifier"]:
+            print("\n[WARN] Baseline was recorded with a different classifier mode")
+        regressions = compare(report, baseline, args.tolerance)
+        for stage, metric, old, new, ratio in regressions:
+            print(f"REGRESSION {stage} {metric}: {old:.3f} -> {new:.3f} ms ({ratio:.2f}x)")
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
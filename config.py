@@ -0,0 +1,289 @@
+# ======================================================
+# CONFIGURATION
+# Tunables shared across modules, overridable via env vars
+# ======================================================
+
+import hashlib
+import os
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _env_float(name, default):
+    return float(os.environ.get(name, default))
+
+
+def _dir_fingerprint(path):
+    # Name, size and mtime of every file, so a model retrained into the
+    # same directory gets a new fingerprint without hashing its weights
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            stat = os.stat(file_path)
+            digest.update(f"{os.path.relpath(file_path, path)}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()[:12]
+
+
+# ======================================================
+# NLP INFERENCE
+# ======================================================
+
+# Max (text, label) pairs per forward pass
+NLP_BATCH_SIZE = _env_int("DECEPTA_NLP_BATCH_SIZE", 16)
+
+# Max padded tokens per forward pass (batch rows * longest row)
+NLP_MAX_BATCH_TOKENS = _env_int("DECEPTA_NLP_MAX_BATCH_TOKENS", 8192)
+
+NLP_MODEL_NAME = "valhalla/distilbart-mnli-12-1"
+
+# "torch" (fp32), "torch-int8" (dynamic quantization), "onnx" or
+# "student" (single-pass model distilled with distill.py)
+NLP_BACKEND = os.environ.get("DECEPTA_NLP_BACKEND", "torch")
+
+# Where the exported ONNX graph is cached between runs
+NLP_ONNX_DIR = os.environ.get("DECEPTA_NLP_ONNX_DIR", "models/distilbart-mnli-onnx")
+
+# Where distill.py saves the student and the "student" backend loads it
+NLP_STUDENT_DIR = os.environ.get("DECEPTA_NLP_STUDENT_DIR", "models/phishing-student")
+
+# Bump when scoring logic changes so cached results are invalidated
+ANALYSIS_VERSION = "9"
+MODEL_VERSION = f"{NLP_MODEL_NAME}:{NLP_BACKEND}@{ANALYSIS_VERSION}"
+if NLP_BACKEND == "student":
+    # The student's weights, not the teacher name, decide its scores
+    MODEL_VERSION += f"+student:{_dir_fingerprint(NLP_STUDENT_DIR)}"
+
+
+# ======================================================
+# RESULT CACHE
+# ======================================================
+
+# In-process LRU entries
+RESULT_CACHE_SIZE = _env_int("DECEPTA_RESULT_CACHE_SIZE", 2048)
+
+# Entries older than this are ignored in both tiers
+RESULT_CACHE_TTL_SECONDS = _env_int("DECEPTA_RESULT_CACHE_TTL", 7 * 24 * 3600)
+
+# How often expired result_cache rows are deleted
+RESULT_CACHE_PRUNE_SECONDS = _env_int("DECEPTA_RESULT_CACHE_PRUNE_SECONDS", 3600)
+
+
+# ======================================================
+# LIVE VOICE
+# ======================================================
+
+# Sliding window over the transcript, in whitespace tokens
+LIVE_WINDOW_TOKENS = _env_int("DECEPTA_LIVE_WINDOW_TOKENS", 64)
+LIVE_WINDOW_OVERLAP = _env_int("DECEPTA_LIVE_WINDOW_OVERLAP", 16)
+
+# "max" or "decayed_mean"
+LIVE_AGGREGATION = os.environ.get("DECEPTA_LIVE_AGGREGATION", "max")
+LIVE_DECAY = _env_float("DECEPTA_LIVE_DECAY", 0.8)
+
+
+# ======================================================
+# MODEL LOADING
+# ======================================================
+
+# Load all registered models in a background thread at app startup
+# instead of on the first request that needs them
+MODEL_WARMUP = os.environ.get("DECEPTA_MODEL_WARMUP", "0") == "1"
+
+
+# ======================================================
+# EMAIL PARSING
+# ======================================================
+
+# Input beyond this many bytes is not fed to the parser at all
+EML_MAX_MESSAGE_BYTES = _env_int("DECEPTA_EML_MAX_MESSAGE_BYTES", 10 * 2**20)
+
+# Text parts with a larger encoded payload are not decoded
+EML_MAX_PART_BYTES = _env_int("DECEPTA_EML_MAX_PART_BYTES", 2 * 2**20)
+
+# Extracted body text is cut to this many characters
+EML_MAX_BODY_CHARS = _env_int("DECEPTA_EML_MAX_BODY_CHARS", 200_000)
+
+
+# ======================================================
+# DATABASE
+# ======================================================
+
+# Idle connections kept for reuse by short-lived (request) threads
+DB_POOL_SIZE = _env_int("DECEPTA_DB_POOL_SIZE", 8)
+
+# SQLite page cache per pooled connection
+DB_CACHE_SIZE_KIB = _env_int("DECEPTA_DB_CACHE_SIZE_KIB", 16 * 1024)
+
+# Prepared statements kept per connection
+DB_STATEMENT_CACHE = _env_int("DECEPTA_DB_STATEMENT_CACHE", 128)
+
+# How long a writer waits for the lock before raising
+DB_BUSY_TIMEOUT_SECONDS = _env_float("DECEPTA_DB_BUSY_TIMEOUT", 5.0)
+
+
+# Background analysis-log writer: rows per transaction, max delay
+# before a partial batch is written, and queued rows before submit()
+# blocks
+ANALYSIS_WRITER_BATCH = _env_int("DECEPTA_ANALYSIS_WRITER_BATCH", 256)
+ANALYSIS_WRITER_FLUSH_SECONDS = _env_float("DECEPTA_ANALYSIS_WRITER_FLUSH_SECONDS", 1.0)
+ANALYSIS_WRITER_QUEUE = _env_int("DECEPTA_ANALYSIS_WRITER_QUEUE", 10_000)
+
+
+# ======================================================
+# LOGIN
+# ======================================================
+
+# bcrypt cost factor; existing hashes are upgraded on next login
+BCRYPT_ROUNDS = _env_int("DECEPTA_BCRYPT_ROUNDS", 12)
+
+# Threads doing bcrypt work, and attempts allowed to wait for one
+AUTH_HASH_WORKERS = _env_int("DECEPTA_AUTH_HASH_WORKERS", 2)
+AUTH_HASH_QUEUE = _env_int("DECEPTA_AUTH_HASH_QUEUE", 16)
+
+# Attempts over this window are counted for throttling
+AUTH_THROTTLE_WINDOW_SECONDS = _env_int("DECEPTA_AUTH_THROTTLE_WINDOW", 15 * 60)
+AUTH_MAX_FAILURES_PER_ACCOUNT = _env_int("DECEPTA_AUTH_MAX_ACCOUNT_FAILURES", 5)
+AUTH_MAX_ATTEMPTS_PER_IP = _env_int("DECEPTA_AUTH_MAX_IP_ATTEMPTS", 30)
+
+
+# ======================================================
+# SENDER EXCEPTIONS
+# ======================================================
+
+# Users whose allowlist is kept in memory
+EXCEPTION_CACHE_USERS = _env_int("DECEPTA_EXCEPTION_CACHE_USERS", 1024)
+
+# Reload a user's allowlist after this long, so exceptions added
+# through another worker process are picked up
+EXCEPTION_CACHE_TTL_SECONDS = _env_int("DECEPTA_EXCEPTION_CACHE_TTL", 300)
+
+
+# ======================================================
+# JOBS
+# ======================================================
+
+# kind -> (worker threads, max queued + running jobs)
+JOB_LIMITS = {
+    "email": (
+        _env_int("DECEPTA_JOB_EMAIL_WORKERS", 4),
+        _env_int("DECEPTA_JOB_EMAIL_PENDING", 200)
+    ),
+    "voice": (
+        _env_int("DECEPTA_JOB_VOICE_WORKERS", 1),
+        _env_int("DECEPTA_JOB_VOICE_PENDING", 20)
+    )
+}
+
+# Finished jobs (and their results) are kept this long for polling
+JOB_RESULT_TTL_SECONDS = _env_int("DECEPTA_JOB_RESULT_TTL", 3600)
+
+
+# ======================================================
+# UPLOADS
+# ======================================================
+
+# Uploads up to this size stay in memory; larger ones are spooled to
+# a unique temp file that is removed once the job finishes
+UPLOAD_SPOOL_BYTES = _env_int("DECEPTA_UPLOAD_SPOOL_BYTES", 8 * 2**20)
+
+# Where spooled uploads go (default: the system temp dir)
+UPLOAD_SPOOL_DIR = os.environ.get("DECEPTA_UPLOAD_SPOOL_DIR") or None
+
+
+# ======================================================
+# JSON API
+# ======================================================
+
+# Messages accepted in one /api/v1/analyze request
+API_MAX_MESSAGES = _env_int("DECEPTA_API_MAX_MESSAGES", 100)
+
+# Largest request body Flask will read (all uploads, not just the API)
+MAX_REQUEST_BYTES = _env_int("DECEPTA_MAX_REQUEST_BYTES", 64 * 2**20)
+
+
+# ======================================================
+# DECISION CASCADE
+# ======================================================
+
+# Run cheap rule stages first and only call the classifier when
+# their combined score lands in the uncertain band
+CASCADE_ENABLED = os.environ.get("DECEPTA_CASCADE", "1") == "1"
+
+# Rule score at or below this: benign without the classifier
+CASCADE_BENIGN_MAX = _env_float("DECEPTA_CASCADE_BENIGN_MAX", 0.0)
+
+# Rule score at or above this: phishing without the classifier
+CASCADE_PHISHING_MIN = _env_float("DECEPTA_CASCADE_PHISHING_MIN", 0.8)
+
+# A DMARC failure (or SPF and DKIM both failing) is treated as
+# phishing without the classifier
+AUTH_SHORT_CIRCUIT = os.environ.get("DECEPTA_AUTH_SHORT_CIRCUIT", "1") == "1"
+
+# How much the SPF / DKIM / DMARC risk adds to the final risk score
+AUTH_WEIGHT = _env_float("DECEPTA_AUTH_WEIGHT", 0.3)
+
+
+# ======================================================
+# SENDER REPUTATION
+# ======================================================
+
+REPUTATION_ENABLED = os.environ.get("DECEPTA_REPUTATION", "1") == "1"
+
+# History read from the hourly domain rollup, and how fast it fades
+REPUTATION_WINDOW_HOURS = _env_int("DECEPTA_REPUTATION_WINDOW_HOURS", 72)
+REPUTATION_HALF_LIFE_HOURS = _env_float("DECEPTA_REPUTATION_HALF_LIFE_HOURS", 12.0)
+
+# Rebuild from the database this often; decisions made in between are
+# applied in memory straight away
+REPUTATION_REFRESH_SECONDS = _env_int("DECEPTA_REPUTATION_REFRESH_SECONDS", 300)
+
+# Decayed message count before a domain's history is used at all
+REPUTATION_MIN_MESSAGES = _env_float("DECEPTA_REPUTATION_MIN_MESSAGES", 5)
+
+# Known-bad: with enough history, a domain whose mail was mostly
+# BLOCKed (or WARNed) gets at least that decision again, without
+# running the classifier
+REPUTATION_BAD_MIN_MESSAGES = _env_float("DECEPTA_REPUTATION_BAD_MIN_MESSAGES", 10)
+REPUTATION_BAD_BLOCK_RATE = _env_float("DECEPTA_REPUTATION_BAD_BLOCK_RATE", 0.8)
+REPUTATION_BAD_FLAG_RATE = _env_float("DECEPTA_REPUTATION_BAD_FLAG_RATE", 0.9)
+
+# How much a domain's reputation risk can add to the final risk score
+REPUTATION_WEIGHT = _env_float("DECEPTA_REPUTATION_WEIGHT", 0.2)
+
+# Mailbox providers shared by everyone: their history says nothing
+# about the next sender
+REPUTATION_SHARED_DOMAINS = frozenset(
+    os.environ.get(
+        "DECEPTA_REPUTATION_SHARED_DOMAINS",
+        "gmail.com,googlemail.com,outlook.com,hotmail.com,live.com,"
+        "yahoo.com,icloud.com,aol.com,proton.me,protonmail.com"
+    ).split(",")
+)
+
+
+# ======================================================
+# TEXT ASSEMBLY
+# ======================================================
+
+# Estimated tokens of email / transcript text per classifier input.
+# Longer text is cut down to its most telling sentences.
+TEXT_WINDOW_TOKENS = _env_int("DECEPTA_TEXT_WINDOW_TOKENS", 448)
+
+# When cue / link sentences overflow the first window, at most this
+# many windows are classified in total
+TEXT_MAX_WINDOWS = _env_int("DECEPTA_TEXT_MAX_WINDOWS", 3)
+
+
+# ======================================================
+# METRICS
+# ======================================================
+
+# Stage timers and counters, served in Prometheus format on /metrics
+METRICS_ENABLED = os.environ.get("DECEPTA_METRICS", "1") == "1"
+
+# Also attach per-stage timings to each result under "timings"
+RESULT_TIMINGS = os.environ.get("DECEPTA_RESULT_TIMINGS", "0") == "1"
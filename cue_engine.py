@@ -0,0 +1,201 @@
+# ======================================================
+# CUE ENGINE
+# Single-pass social-engineering cue matcher
+# ======================================================
+
+import re
+
+# Category -> cue words and phrases. Matching is whole-word and
+# case-insensitive; each cue also matches its plain inflections
+# (SUFFIXES), so "pin" matches "PIN" / "pins" but not "shopping".
+CUE_DEFINITIONS = {
+    "urgency": [
+        "urgent", "urgently", "immediately", "within", "suspended",
+        "locked", "expire", "expiring", "expiry", "expiration",
+        "final warning", "action required"
+    ],
+    "credential_request": [
+        "password", "otp", "verification code", "login", "log in",
+        "credentials", "pin"
+    ],
+    "authority_impersonation": [
+        "admin", "administrator", "support", "security team", "bank",
+        "banking", "it desk"
+    ],
+    "action_request": [
+        "click", "verify", "verified", "verifies", "verifying",
+        "confirm", "update", "reset"
+    ]
+}
+
+SUFFIXES = ("", "s", "es", "ed", "d", "ing")
+INFLECTION = r"(?:s|es|ed|d|ing)?"
+
+# A token is a run of letters and digits; "_" separates tokens like any
+# other symbol, so "login_page" holds the cue "login". The regex
+# boundaries below use the same definition, so both paths agree.
+_TOKEN = re.compile(r"[^\W_]+")
+_START = r"(?<![^\W_])"
+_END = r"(?![^\W_])"
+
+# ASCII fast path: every byte but [0-9a-z] becomes a space (the text is
+# lowercased first)
+_ASCII_SEPARATORS = bytes(
+    b if chr(b).isdigit() or "a" <= chr(b) <= "z" else 32 for b in range(256)
+)
+
+
+def _tokens(lower):
+    if lower.isascii():
+        return set(lower.encode("ascii").translate(_ASCII_SEPARATORS).decode("ascii").split())
+    return set(_TOKEN.findall(lower))
+
+
+# Words of a multi-word cue may be joined by spaces or hyphens
+_PHRASE_SEPARATOR = re.compile(r"[\s\-]+")
+
+
+def _trie_pattern(phrases):
+    """
+    Alternation of the given word sequences, factored into a trie so the
+    regex engine tries each leading letter once rather than every cue
+    """
+
+    trie = {}
+    for words in phrases:
+        node = trie
+        for ch in " ".join(words):
+            node = node.setdefault(ch, {})
+        node[""] = {}
+    return _trie_branches(trie)
+
+
+def _trie_branches(node):
+    branches = [
+        (_PHRASE_SEPARATOR.pattern if ch == " " else re.escape(ch)) + _trie_branches(child)
+        for ch, child in sorted(node.items()) if ch
+    ]
+    if not branches:
+        return ""
+    group = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    return f"(?:{group})?" if "" in node else group
+
+
+class CueEngine:
+    """
+    The text is lowercased and split into a token set once (all in C);
+    single-word cues are then found with one set intersection, and
+    multi-word cues are only confirmed by regex when all their words
+    are present. Offsets come from one pass of a combined regex over
+    the text, run only when the token pass found a cue.
+    """
+
+    def __init__(self, definitions=CUE_DEFINITIONS):
+        self.categories = list(definitions)
+
+        # surface form -> (category, cue)
+        self._words = {}
+        # (category, cue, words that must all be tokens, pattern)
+        self._phrases = []
+        # every matchable form, words joined by one space -> category
+        self._surfaces = {}
+
+        cue_words = []
+        for category, cues in definitions.items():
+            for cue in cues:
+                words = cue.lower().split()
+                cue_words.append(words)
+                for suffix in SUFFIXES:
+                    self._surfaces.setdefault(" ".join(words) + suffix, category)
+
+                if len(words) == 1:
+                    for suffix in SUFFIXES:
+                        self._words.setdefault(words[0] + suffix, (category, cue))
+                else:
+                    pattern = re.compile(
+                        _START + _PHRASE_SEPARATOR.pattern.join(map(re.escape, words))
+                        + INFLECTION + _END,
+                        re.IGNORECASE
+                    )
+                    # The last word may carry an inflection, so only the
+                    # leading words are required as exact tokens
+                    self._phrases.append((category, cue, frozenset(words[:-1]), pattern))
+
+        self._vocabulary = frozenset(self._words)
+
+        combined = _START + _trie_pattern(cue_words) + INFLECTION + _END
+        # Run on the lowercased text; IGNORECASE only for the rare text
+        # whose length lower() changes, where offsets would shift
+        self._combined = re.compile(combined)
+        self._combined_ignorecase = re.compile(combined, re.IGNORECASE)
+
+    def _matched_cues(self, text, stop_when_complete):
+        tokens = _tokens(text.lower())
+
+        matched = {}
+        for surface in self._vocabulary.intersection(tokens):
+            category, cue = self._words[surface]
+            matched[cue] = category
+
+        for category, cue, required, pattern in self._phrases:
+            if stop_when_complete and len(set(matched.values())) == len(self.categories):
+                break
+            if required <= tokens and pattern.search(text):
+                matched[cue] = category
+
+        return matched
+
+    def _locate(self, text):
+        lower = text.lower()
+        if len(lower) == len(text):
+            matches = self._combined.finditer(lower)
+        else:
+            matches = self._combined_ignorecase.finditer(text)
+
+        return [
+            {
+                "cue": self._surfaces[" ".join(_PHRASE_SEPARATOR.split(match.group().lower()))],
+                "start": match.start(),
+                "end": match.end(),
+                "text": text[match.start():match.end()]
+            }
+            for match in matches
+        ]
+
+    def scan(self, text: str):
+        """
+        (categories, matches): categories_in() and find() of the text,
+        sharing one token pass
+        """
+
+        found = set(self._matched_cues(text, False).values())
+        if not found:
+            return [], []
+        return [c for c in self.categories if c in found], self._locate(text)
+
+    def find(self, text: str) -> list:
+        """
+        Every cue occurrence as {cue, start, end, text}, in text order
+        """
+
+        return self.scan(text)[1]
+
+    def categories_in(self, text: str) -> list:
+        """
+        Distinct cue categories, skipping phrase checks once all are found
+        """
+
+        found = set(self._matched_cues(text, True).values())
+        return [c for c in self.categories if c in found]
+
+
+_cue_engine = CueEngine()
+
+def scan_cues(text: str):
+    return _cue_engine.scan(text)
+
+def find_cues(text: str) -> list:
+    return _cue_engine.find(text)
+
+def extract_cues(text: str) -> list:
+    return _cue_engine.categories_in(text)
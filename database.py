@@ -1,14 +1,381 @@
 import sqlite3
 import json
 import hashlib
+import os
+import secrets
+import threading
 from datetime import datetime
-import bcrypt
+
+from config import DB_CACHE_SIZE_KIB, DB_STATEMENT_CACHE, DB_BUSY_TIMEOUT_SECONDS, DB_POOL_SIZE
 
 DB_NAME = "email_analysis.db"
 
+_local = threading.local()
+
+# Idle (pid, connection) pairs released by threads that are done with
+# them, e.g. a request thread, for the next thread to pick up
+_idle = []
+_idle_lock = threading.Lock()
+
 
 def get_connection():
-    return sqlite3.connect(DB_NAME)
+    """
+    This thread's pooled connection, taken from the idle pool or opened
+    on first use. Long-lived threads (the analysis writer, the batch
+    scanner) keep it for their lifetime; short-lived ones such as
+    request threads hand it back with release_connection(). Callers
+    must not close it.
+    """
+
+    conn = getattr(_local, "conn", None)
+    # A connection must not cross a fork (e.g. the batch scanner's pool)
+    if conn is None or _local.pid != os.getpid():
+        conn = _take_idle() or _open_connection()
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+
+def release_connection():
+    """
+    Return this thread's connection to the idle pool (closed instead
+    when DB_POOL_SIZE connections are already idle)
+    """
+
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        return
+    _local.conn = None
+    if _local.pid != os.getpid():
+        return
+
+    if conn.in_transaction:
+        conn.rollback()
+    with _idle_lock:
+        if len(_idle) < DB_POOL_SIZE:
+            _idle.append((_local.pid, conn))
+            return
+    conn.close()
+
+
+def _take_idle():
+    pid = os.getpid()
+    with _idle_lock:
+        while _idle:
+            owner, conn = _idle.pop()
+            if owner == pid:
+                return conn
+    return None
+
+
+def _open_connection():
+    # Used by one thread at a time, but not always the one that opened it
+    conn = sqlite3.connect(
+        DB_NAME,
+        timeout=DB_BUSY_TIMEOUT_SECONDS,
+        cached_statements=DB_STATEMENT_CACHE,
+        check_same_thread=False
+    )
+    # WAL lets readers run alongside the single writer instead of
+    # serializing every request on the database file
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KIB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+def close_connection():
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+# ======================================================
+# SCHEMA MIGRATIONS
+# ======================================================
+
+# (granularity, length of the ISO created_at prefix that names the bucket)
+ROLLUP_GRANULARITIES = (("hour", 13), ("day", 10))
+
+
+def _rollup_trigger_body():
+    statements = []
+    for granularity, width in ROLLUP_GRANULARITIES:
+        bucket = f"substr(NEW.created_at, 1, {width})"
+        statements += [
+            f"""
+            INSERT INTO rollup_decisions VALUES
+                ('{granularity}', {bucket}, NEW.decision, 1, NEW.risk_score)
+            ON CONFLICT DO UPDATE SET
+                messages = messages + 1,
+                risk_sum = risk_sum + excluded.risk_sum;
+            """,
+            f"""
+            INSERT INTO rollup_domains VALUES
+                ('{granularity}', {bucket}, NEW.sender_domain, 1,
+                 NEW.decision != 'ALLOW', NEW.decision = 'BLOCK', NEW.risk_score)
+            ON CONFLICT DO UPDATE SET
+                messages = messages + 1,
+                flagged = flagged + excluded.flagged,
+                blocked = blocked + excluded.blocked,
+                risk_sum = risk_sum + excluded.risk_sum;
+            """,
+            f"""
+            INSERT INTO rollup_signals
+            SELECT DISTINCT '{granularity}', {bucket}, kind, signal, 1
+            FROM analysis_signals WHERE analysis_id = NEW.id
+            ON CONFLICT DO UPDATE SET messages = messages + 1;
+            """
+        ]
+    return "".join(statements)
+
+
+# (user_version, statements). Applied in order, each in one explicit
+# transaction with its user_version bump; append new steps, never edit
+# applied ones.
+MIGRATIONS = [
+    (1, [
+        # Drop duplicate exceptions before they become impossible
+        """
+        DELETE FROM user_exceptions
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM user_exceptions GROUP BY user_email, sender
+        )
+        """,
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_user_exceptions_user_sender
+        ON user_exceptions (user_email, sender)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_email_analysis_domain_created
+        ON email_analysis (sender_domain, created_at)
+        """
+    ]),
+    (2, [
+        # Only a SHA-256 of each token is stored
+        """
+        CREATE TABLE IF NOT EXISTS api_tokens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            token_hash TEXT UNIQUE,
+            user_email TEXT,
+            name TEXT,
+            created_at TEXT,
+            revoked INTEGER DEFAULT 0
+        )
+        """
+    ]),
+    (3, [
+        # Cues and flags, one row each, so they can be counted by index
+        """
+        CREATE TABLE IF NOT EXISTS analysis_signals (
+            analysis_id INTEGER,
+            kind TEXT,
+            signal TEXT,
+            created_at TEXT
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_analysis_signals_kind_signal
+        ON analysis_signals (kind, signal, created_at)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_analysis_signals_analysis
+        ON analysis_signals (analysis_id)
+        """,
+        # Rollups, keyed on ("hour", "2026-01-31T14") / ("day", "2026-01-31")
+        """
+        CREATE TABLE IF NOT EXISTS rollup_decisions (
+            granularity TEXT,
+            bucket TEXT,
+            decision TEXT,
+            messages INTEGER,
+            risk_sum REAL,
+            PRIMARY KEY (granularity, bucket, decision)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS rollup_domains (
+            granularity TEXT,
+            bucket TEXT,
+            sender_domain TEXT,
+            messages INTEGER,
+            flagged INTEGER,
+            blocked INTEGER,
+            risk_sum REAL,
+            PRIMARY KEY (granularity, bucket, sender_domain)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS rollup_signals (
+            granularity TEXT,
+            bucket TEXT,
+            kind TEXT,
+            signal TEXT,
+            messages INTEGER,
+            PRIMARY KEY (granularity, bucket, kind, signal)
+        )
+        """,
+        # Backfill from rows written before the rollups existed
+        """
+        INSERT INTO analysis_signals (analysis_id, kind, signal, created_at)
+        SELECT a.id, 'cue', j.value, a.created_at
+        FROM email_analysis a, json_each(a.nlp_cues) j
+        WHERE json_valid(a.nlp_cues)
+        UNION ALL
+        SELECT a.id, 'flag', j.value, a.created_at
+        FROM email_analysis a, json_each(a.behavioral_flags) j
+        WHERE json_valid(a.behavioral_flags)
+        """,
+        *[
+            f"""
+            INSERT INTO rollup_decisions
+            SELECT '{granularity}', substr(created_at, 1, {width}), decision,
+                   COUNT(*), SUM(risk_score)
+            FROM email_analysis
+            GROUP BY 2, decision
+            """
+            for granularity, width in ROLLUP_GRANULARITIES
+        ],
+        *[
+            f"""
+            INSERT INTO rollup_domains
+            SELECT '{granularity}', substr(created_at, 1, {width}), sender_domain,
+                   COUNT(*), SUM(decision != 'ALLOW'), SUM(decision = 'BLOCK'),
+                   SUM(risk_score)
+            FROM email_analysis
+            GROUP BY 2, sender_domain
+            """
+            for granularity, width in ROLLUP_GRANULARITIES
+        ],
+        *[
+            f"""
+            INSERT INTO rollup_signals
+            SELECT '{granularity}', substr(created_at, 1, {width}), kind, signal,
+                   COUNT(DISTINCT analysis_id)
+            FROM analysis_signals
+            GROUP BY 2, kind, signal
+            """
+            for granularity, width in ROLLUP_GRANULARITIES
+        ],
+        # From here on every insert keeps the side table and rollups
+        # current, whichever code path wrote the row
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_email_analysis_rollups
+        AFTER INSERT ON email_analysis
+        BEGIN
+            INSERT INTO analysis_signals (analysis_id, kind, signal, created_at)
+            SELECT NEW.id, 'cue', value, NEW.created_at
+            FROM json_each(CASE WHEN json_valid(NEW.nlp_cues) THEN NEW.nlp_cues ELSE '[]' END);
+
+            INSERT INTO analysis_signals (analysis_id, kind, signal, created_at)
+            SELECT NEW.id, 'flag', value, NEW.created_at
+            FROM json_each(CASE WHEN json_valid(NEW.behavioral_flags) THEN NEW.behavioral_flags ELSE '[]' END);
+
+            {_rollup_trigger_body()}
+        END
+        """
+    ]),
+    (4, [
+        # Sender reputation only learns from rows flagged as input: not
+        # decided by the reputation itself, not sent from a forged domain
+        """
+        ALTER TABLE email_analysis ADD COLUMN reputation_input INTEGER DEFAULT 1
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS rollup_reputation (
+            bucket TEXT,
+            sender_domain TEXT,
+            messages INTEGER,
+            flagged INTEGER,
+            blocked INTEGER,
+            risk_sum REAL,
+            PRIMARY KEY (bucket, sender_domain)
+        )
+        """,
+        """
+        INSERT INTO rollup_reputation
+        SELECT bucket, sender_domain, messages, flagged, blocked, risk_sum
+        FROM rollup_domains
+        WHERE granularity = 'hour'
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_email_analysis_reputation
+        AFTER INSERT ON email_analysis
+        WHEN NEW.reputation_input
+        BEGIN
+            INSERT INTO rollup_reputation VALUES
+                (substr(NEW.created_at, 1, 13), NEW.sender_domain, 1,
+                 NEW.decision != 'ALLOW', NEW.decision = 'BLOCK', NEW.risk_score)
+            ON CONFLICT DO UPDATE SET
+                messages = messages + 1,
+                flagged = flagged + excluded.flagged,
+                blocked = blocked + excluded.blocked,
+                risk_sum = risk_sum + excluded.risk_sum;
+        END
+        """
+    ]),
+    (5, [
+        # prune_cached_results() deletes by age
+        """
+        CREATE INDEX IF NOT EXISTS idx_result_cache_created
+        ON result_cache (created_at)
+        """
+    ]),
+    (6, [
+        # The key is result_key(), not the email hash. Rebuilt rather
+        # than renamed because init_cache_table() may already have
+        # created the new layout; the rows are only a cache.
+        "DROP TABLE IF EXISTS result_cache",
+        """
+        CREATE TABLE result_cache (
+            result_key TEXT PRIMARY KEY,
+            model_version TEXT,
+            result_json TEXT,
+            created_at REAL
+        )
+        """,
+        """
+        CREATE INDEX idx_result_cache_created
+        ON result_cache (created_at)
+        """
+    ]),
+]
+
+
+def migrate():
+    """
+    Create missing tables, then apply pending MIGRATIONS, tracking
+    progress in PRAGMA user_version
+    """
+
+    init_db()
+    init_user_table()
+    init_exception_table()
+    init_cache_table()
+
+    conn = get_connection()
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+
+    for version, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        # sqlite3 opens no implicit transaction for DDL, so each step
+        # begins its own; IMMEDIATE takes the write lock up front so a
+        # second process migrating at the same time waits, then skips
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            current = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version > current:
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {version}")
+                current = version
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
 
 def init_db():
     conn = get_connection()
@@ -28,7 +395,6 @@ def init_db():
     """)
 
     conn.commit()
-    conn.close()
 
 def init_user_table():
     conn = get_connection()
@@ -43,15 +409,17 @@ def init_user_table():
     """)
 
     conn.commit()
-    conn.close()
 
 
-def create_user(email, password):
+def create_user(email, password_hash):
+    """
+    Store a new user; the hash comes from login_security.
+    False if the email is already registered.
+    """
+
     conn = get_connection()
     cursor = conn.cursor()
 
-    password_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
-
     try:
         cursor.execute(
             "INSERT INTO users (email, password_hash) VALUES (?, ?)",
@@ -60,12 +428,21 @@ def create_user(email, password):
         conn.commit()
         return True
     except sqlite3.IntegrityError:
+        # The pooled connection outlives this call: end the transaction
+        conn.rollback()
         return False
-    finally:
-        conn.close()
 
 
-def authenticate_user(email, password):
+def user_exists(email):
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT 1 FROM users WHERE email = ?", (email,))
+
+    return cursor.fetchone() is not None
+
+
+def get_password_hash(email):
     conn = get_connection()
     cursor = conn.cursor()
 
@@ -74,9 +451,20 @@ def authenticate_user(email, password):
         (email,)
     )
     row = cursor.fetchone()
-    conn.close()
 
-    return row and bcrypt.checkpw(password.encode(), row[0])
+    return row[0] if row else None
+
+
+def set_password_hash(email, password_hash):
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        "UPDATE users SET password_hash = ? WHERE email = ?",
+        (password_hash, email)
+    )
+
+    conn.commit()
 
 def init_exception_table():
     conn = get_connection()
@@ -92,7 +480,6 @@ def init_exception_table():
     """)
 
     conn.commit()
-    conn.close()
 
 
 def add_exception(user_email, sender):
@@ -100,27 +487,78 @@ def add_exception(user_email, sender):
     cursor = conn.cursor()
 
     cursor.execute("""
-        INSERT INTO user_exceptions (user_email, sender, created_at)
+        INSERT OR IGNORE INTO user_exceptions (user_email, sender, created_at)
         VALUES (?, ?, datetime('now'))
     """, (user_email, sender))
 
     conn.commit()
-    conn.close()
 
 
-def is_exception(user_email, sender):
+def load_exceptions(user_email):
     conn = get_connection()
     cursor = conn.cursor()
 
     cursor.execute("""
-        SELECT 1 FROM user_exceptions
-        WHERE user_email = ? AND sender = ?
-    """, (user_email, sender))
+        SELECT sender FROM user_exceptions
+        WHERE user_email = ?
+    """, (user_email,))
 
-    result = cursor.fetchone()
-    conn.close()
+    return [row[0] for row in cursor.fetchall()]
+
+def create_api_token(user_email, name=""):
+    """
+    Issue a new API token for user_email. The token itself is only
+    returned here; the database keeps its hash.
+    """
+
+    token = secrets.token_urlsafe(32)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        INSERT INTO api_tokens (token_hash, user_email, name, created_at)
+        VALUES (?, ?, ?, datetime('now'))
+    """, (_hash_token(token), user_email, name))
+
+    conn.commit()
+    return token
+
+
+def revoke_api_token(token):
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        "UPDATE api_tokens SET revoked = 1 WHERE token_hash = ?",
+        (_hash_token(token),)
+    )
+
+    conn.commit()
+    return cursor.rowcount > 0
+
+
+def api_token_user(token):
+    """
+    Owner of a valid, unrevoked token, else None
+    """
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT user_email FROM api_tokens
+        WHERE token_hash = ? AND revoked = 0
+    """, (_hash_token(token),))
+
+    row = cursor.fetchone()
+
+    return row[0] if row else None
+
+
+def _hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
 
-    return result is not None
 
 def hash_email(headers, body):
     combined = (
@@ -139,6 +577,19 @@ def extract_sender_domain(headers):
     return "unknown"
 
 
+def analysis_row(headers, body, result):
+    return (
+        hash_email(headers, body),
+        extract_sender_domain(headers),
+        result["decision_engine"]["decision"],
+        result["decision_engine"]["final_risk_score"],
+        json.dumps(result["nlp_analysis"]["detected_cues"]),
+        json.dumps(result["behavioral_analysis"]["behavioral_flags"]),
+        datetime.utcnow().isoformat(),
+        int(result.get("reputation_input", True))
+    )
+
+
 def save_analysis(headers, body, result):
     conn = get_connection()
     cursor = conn.cursor()
@@ -152,20 +603,216 @@ def save_analysis(headers, body, result):
                 risk_score,
                 nlp_cues,
                 behavioral_flags,
-                created_at
+                created_at,
+                reputation_input
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            hash_email(headers, body),
-            extract_sender_domain(headers),
-            result["decision_engine"]["decision"],
-            result["decision_engine"]["final_risk_score"],
-            json.dumps(result["nlp_analysis"]["detected_cues"]),
-            json.dumps(result["behavioral_analysis"]["behavioral_flags"]),
-            datetime.utcnow().isoformat()
-        ))
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, analysis_row(headers, body, result))
         conn.commit()
     except sqlite3.IntegrityError:
-        pass
-    finally:
-        conn.close()
+        conn.rollback()
+
+
+def insert_analysis_rows(rows):
+    """
+    executemany path for rows already built by analysis_row()
+    """
+
+    if not rows:
+        return
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.executemany("""
+            INSERT OR IGNORE INTO email_analysis (
+                email_hash,
+                sender_domain,
+                decision,
+                risk_score,
+                nlp_cues,
+                behavioral_flags,
+                created_at,
+                reputation_input
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+
+# ======================================================
+# ANALYTICS (READS ROLLUPS ONLY)
+# ======================================================
+
+def top_risky_domains(since_day, limit=10):
+    """
+    Sender domains with the most WARN/BLOCK decisions since since_day
+    ("YYYY-MM-DD"), from the daily domain rollup
+    """
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT sender_domain,
+               SUM(messages), SUM(flagged), SUM(blocked),
+               SUM(risk_sum) / SUM(messages)
+        FROM rollup_domains
+        WHERE granularity = 'day' AND bucket >= ?
+        GROUP BY sender_domain
+        HAVING SUM(flagged) > 0
+        ORDER BY SUM(flagged) DESC, SUM(risk_sum) / SUM(messages) DESC
+        LIMIT ?
+    """, (since_day, limit))
+
+    return [
+        {
+            "sender_domain": domain,
+            "messages": messages,
+            "flagged": flagged,
+            "blocked": blocked,
+            "avg_risk": round(avg_risk or 0.0, 3)
+        }
+        for domain, messages, flagged, blocked, avg_risk in cursor.fetchall()
+    ]
+
+
+def decision_counts(granularity, since_bucket):
+    """
+    {bucket: {decision: count}} in bucket order
+    """
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT bucket, decision, messages
+        FROM rollup_decisions
+        WHERE granularity = ? AND bucket >= ?
+        ORDER BY bucket
+    """, (granularity, since_bucket))
+
+    series = {}
+    for bucket, decision, messages in cursor.fetchall():
+        series.setdefault(bucket, {})[decision] = messages
+    return series
+
+
+def signal_counts(kind, since_day):
+    """
+    Messages per cue ("cue") or behavioral flag ("flag") since since_day
+    """
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT signal, SUM(messages)
+        FROM rollup_signals
+        WHERE granularity = 'day' AND kind = ? AND bucket >= ?
+        GROUP BY signal
+        ORDER BY SUM(messages) DESC
+    """, (kind, since_day))
+
+    return dict(cursor.fetchall())
+
+
+def domain_rollups_since(since_hour):
+    """
+    Hourly (bucket, sender_domain, messages, flagged, blocked, risk_sum)
+    rows from since_hour ("YYYY-MM-DDTHH") on, counting only the rows
+    stored as reputation input
+    """
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT bucket, sender_domain, messages, flagged, blocked, risk_sum
+        FROM rollup_reputation
+        WHERE bucket >= ?
+    """, (since_hour,))
+
+    return cursor.fetchall()
+
+
+def init_cache_table():
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS result_cache (
+            result_key TEXT PRIMARY KEY,
+            model_version TEXT,
+            result_json TEXT,
+            created_at REAL
+        )
+    """)
+
+    conn.commit()
+
+
+def load_cached_result(key, model_version, min_created_at):
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT result_json, created_at FROM result_cache
+        WHERE result_key = ? AND model_version = ? AND created_at >= ?
+    """, (key, model_version, min_created_at))
+
+    row = cursor.fetchone()
+
+    if row is None:
+        return None
+    return json.loads(row[0]), row[1]
+
+
+def store_cached_results(entries):
+    """
+    executemany path for (key, model_version, result, created_at)
+    cache entries, one transaction
+    """
+
+    if not entries:
+        return
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.executemany("""
+            INSERT OR REPLACE INTO result_cache (
+                result_key, model_version, result_json, created_at
+            )
+            VALUES (?, ?, ?, ?)
+        """, [
+            (key, model_version, json.dumps(result), created_at)
+            for key, model_version, result, created_at in entries
+        ])
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+
+def prune_cached_results(min_created_at, model_version):
+    """
+    Delete cache rows that load_cached_result() would ignore: expired,
+    or written by another model version. Returns the rows removed.
+    """
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        DELETE FROM result_cache
+        WHERE created_at < ? OR model_version != ?
+    """, (min_created_at, model_version))
+
+    conn.commit()
+    return cursor.rowcount
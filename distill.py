@@ -0,0 +1,337 @@
+# ======================================================
+# DISTILLATION
+# Label a local corpus with the zero-shot teacher, train a
+# single-pass student on it and report their agreement
+#
+#   python distill.py label --corpus "mail/**/*.eml" --corpus "calls/*.txt"
+#   python distill.py train --mode head --encoder path/to/MiniLM
+#   python distill.py evaluate
+# ======================================================
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+
+from config import NLP_STUDENT_DIR, MODEL_VERSION
+from cue_engine import extract_cues
+from eml_parser import parse_eml_stream
+from nlp_engine import BACKENDS, LABELS, PhishingNLPModule, phishing_base_score, score_cues
+from student_model import STUDENT_CONFIG, STUDENT_MODES, StudentClassifier, mean_pool
+from text_builder import build_email_text, build_windows
+from backend_parity import compare
+
+DEFAULT_LABELS = "distill_labels.jsonl"
+
+# build_result() reports "medium" confidence or higher above this
+FLAG_THRESHOLD = 0.4
+
+
+# ======================================================
+# LABELLING
+# ======================================================
+
+def corpus_windows(patterns):
+    """
+    (source, window index, text) for every classifier window of every
+    .eml / .txt file matching the patterns, cut exactly as the live
+    pipeline cuts them
+    """
+
+    for path in sorted({p for pattern in patterns for p in glob.glob(pattern, recursive=True)}):
+        if path.endswith(".eml"):
+            parsed = parse_eml_stream(path)
+            _, windows = build_email_text(parsed["headers"], parsed["body"])
+        elif path.endswith(".txt"):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                text = f.read().strip()
+            if not text:
+                continue
+            windows = build_windows(text)
+        else:
+            continue
+        for index, window in enumerate(windows):
+            yield path, index, window
+
+
+def split_of(source, heldout):
+    # By source file, so windows of one message never straddle the split
+    bucket = int(hashlib.sha1(source.encode()).hexdigest()[:8], 16) % 1000
+    return "heldout" if bucket < heldout * 1000 else "train"
+
+
+def label(args):
+    teacher = PhishingNLPModule(backend=args.backend)
+
+    count = 0
+    with open(args.output, "w", encoding="utf-8") as out:
+        batch = []
+
+        def flush():
+            started = time.perf_counter()
+            scores = teacher.classify_batch([text for _, _, text in batch])
+            per_text_ms = (time.perf_counter() - started) * 1e3 / len(batch)
+            for (source, index, text), label_scores in zip(batch, scores):
+                out.write(json.dumps({
+                    "source": source,
+                    "window": index,
+                    "split": split_of(source, args.heldout),
+                    "text": text,
+                    "scores": label_scores,
+                    "cues": extract_cues(text),
+                    "teacher_ms": round(per_text_ms, 3)
+                }) + "\n")
+            batch.clear()
+
+        for item in corpus_windows(args.corpus):
+            batch.append(item)
+            count += 1
+            if len(batch) >= args.batch_size:
+                flush()
+        if batch:
+            flush()
+
+    print(f"labelled {count} windows with {MODEL_VERSION} -> {args.output}")
+    return 0 if count else 1
+
+
+def load_examples(path, split):
+    with open(path, encoding="utf-8") as f:
+        return [e for e in map(json.loads, f) if e["split"] == split]
+
+
+# ======================================================
+# TRAINING
+# ======================================================
+
+def train(args):
+    import torch
+    import torch.nn.functional as F
+    from transformers import AutoTokenizer
+
+    examples = load_examples(args.labels, "train")
+    if not examples:
+        print(f"No training examples in {args.labels}")
+        return 1
+
+    torch.manual_seed(args.seed)
+    random.seed(args.seed)
+
+    labels = list(LABELS)
+    texts = [e["text"] for e in examples]
+    targets = torch.tensor([[e["scores"][label] for label in labels] for e in examples])
+    targets = targets / targets.sum(dim=1, keepdim=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(args.encoder)
+    args.max_length = min(args.max_length, tokenizer.model_max_length)
+
+    def encode(batch_texts):
+        return tokenizer(batch_texts, truncation=True, max_length=args.max_length,
+                         padding=True, return_tensors="pt")
+
+    def batches(n):
+        order = list(range(n))
+        random.shuffle(order)
+        for start in range(0, n, args.batch_size):
+            yield order[start:start + args.batch_size]
+
+    os.makedirs(args.output, exist_ok=True)
+
+    if args.mode == "head":
+        from transformers import AutoModel
+
+        encoder = AutoModel.from_pretrained(args.encoder)
+        encoder.eval()
+
+        # The encoder is frozen, so every text is embedded exactly once
+        embeddings = []
+        with torch.no_grad():
+            for start in range(0, len(texts), args.batch_size):
+                encoded = encode(texts[start:start + args.batch_size])
+                hidden = encoder(**encoded).last_hidden_state
+                embeddings.append(mean_pool(hidden, encoded["attention_mask"]))
+        embeddings = torch.cat(embeddings)
+
+        head = torch.nn.Linear(embeddings.shape[1], len(labels))
+        optimizer = torch.optim.Adam(head.parameters(), lr=args.lr or 1e-2)
+
+        for epoch in range(args.epochs):
+            total = 0.0
+            for batch in batches(len(texts)):
+                log_probs = F.log_softmax(head(embeddings[batch]), dim=-1)
+                loss = F.kl_div(log_probs, targets[batch], reduction="batchmean")
+                optimizer.zero_grad()
+                loss.backward()
+                optimizer.step()
+                total += loss.item() * len(batch)
+            _report_epoch(epoch, args.epochs, total / len(texts))
+
+        encoder.save_pretrained(os.path.join(args.output, "encoder"))
+        torch.save(head.state_dict(), os.path.join(args.output, "head.pt"))
+
+    else:
+        from transformers import AutoModelForSequenceClassification
+
+        model = AutoModelForSequenceClassification.from_pretrained(
+            args.encoder,
+            num_labels=len(labels),
+            id2label=dict(enumerate(labels)),
+            label2id={label: i for i, label in enumerate(labels)}
+        )
+        optimizer = torch.optim.AdamW(model.parameters(), lr=args.lr or 3e-5)
+
+        for epoch in range(args.epochs):
+            model.train()
+            total = 0.0
+            for batch in batches(len(texts)):
+                logits = model(**encode([texts[i] for i in batch])).logits
+                loss = F.kl_div(F.log_softmax(logits, dim=-1), targets[batch], reduction="batchmean")
+                optimizer.zero_grad()
+                loss.backward()
+                optimizer.step()
+                total += loss.item() * len(batch)
+            _report_epoch(epoch, args.epochs, total / len(texts))
+
+        model.save_pretrained(args.output)
+
+    tokenizer.save_pretrained(args.output)
+    with open(os.path.join(args.output, STUDENT_CONFIG), "w") as f:
+        json.dump({
+            "mode": args.mode,
+            "labels": labels,
+            "max_length": args.max_length,
+            "encoder": args.encoder,
+            "teacher": MODEL_VERSION,
+            "train_windows": len(texts),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        }, f, indent=2)
+
+    print(f"saved {args.mode} student -> {args.output}")
+    return 0
+
+
+def _report_epoch(epoch, epochs, loss):
+    if (epoch + 1) % max(epochs // 10, 1) == 0 or epoch + 1 == epochs:
+        print(f"epoch {epoch + 1}/{epochs}  kl {loss:.4f}")
+
+
+# ======================================================
+# AGREEMENT REPORT
+# ======================================================
+
+def phishing_score(text, scores):
+    # Same combination build_result() makes of classifier and cue scores
+    return min(phishing_base_score(scores) + score_cues(text)[2], 1.0)
+
+
+def evaluate(args):
+    examples = load_examples(args.labels, "heldout")
+    if not examples:
+        print(f"No held-out examples in {args.labels}")
+        return 1
+
+    student = StudentClassifier(args.student, batch_size=args.batch_size)
+    texts = [e["text"] for e in examples]
+    teacher = [e["scores"] for e in examples]
+
+    # First call pays one-off warm-up costs, keep it out of the timing
+    student.predict(texts[:1])
+    started = time.perf_counter()
+    predicted = student.predict(texts)
+    student_ms = (time.perf_counter() - started) * 1e3 / len(texts)
+    teacher_ms = sum(e["teacher_ms"] for e in examples) / len(examples)
+
+    max_diff, agree = compare(teacher, predicted)
+    mean_diff = sum(
+        abs(t[label] - p[label]) for t, p in zip(teacher, predicted) for label in t
+    ) / (len(examples) * len(student.labels))
+
+    teacher_scores = [phishing_score(text, s) for text, s in zip(texts, teacher)]
+    student_scores = [phishing_score(text, s) for text, s in zip(texts, predicted)]
+    flag_agree = sum(
+        (t > FLAG_THRESHOLD) == (s > FLAG_THRESHOLD)
+        for t, s in zip(teacher_scores, student_scores)
+    )
+
+    report = {
+        "student": args.student,
+        "student_config": student.config,
+        "teacher": MODEL_VERSION,
+        "heldout_windows": len(examples),
+        "heldout_sources": len({e["source"] for e in examples}),
+        "top_label_agreement": round(agree / len(examples), 4),
+        "flag_agreement": round(flag_agree / len(examples), 4),
+        "phishing_score_mae": round(
+            sum(abs(t - s) for t, s in zip(teacher_scores, student_scores)) / len(examples), 4
+        ),
+        "label_mean_abs_diff": round(mean_diff, 4),
+        "label_max_abs_diff": round(max_diff, 4),
+        "teacher_ms_per_window": round(teacher_ms, 3),
+        "student_ms_per_window": round(student_ms, 3),
+        "speedup": round(teacher_ms / student_ms, 1) if student_ms else None
+    }
+
+    for key, value in report.items():
+        if key != "student_config":
+            print(f"{key:<24} {value}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    return 0 if report["top_label_agreement"] >= args.min_agreement else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distil the zero-shot classifier into a single-pass student")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    label_cmd = commands.add_parser("label", help="score a local corpus with the teacher")
+    label_cmd.add_argument("--corpus", action="append", default=None,
+                           help="glob of .eml / .txt files (repeatable, ** allowed)")
+    label_cmd.add_argument("--output", default=DEFAULT_LABELS)
+    label_cmd.add_argument("--heldout", type=float, default=0.2,
+                           help="share of source files kept for evaluation")
+    label_cmd.add_argument("--backend", default="torch",
+                           choices=[b for b in BACKENDS if b != "student"])
+    label_cmd.add_argument("--batch-size", type=int, default=32)
+
+    train_cmd = commands.add_parser("train", help="train a student on the teacher labels")
+    train_cmd.add_argument("--labels", default=DEFAULT_LABELS)
+    train_cmd.add_argument("--output", default=NLP_STUDENT_DIR)
+    train_cmd.add_argument("--mode", choices=STUDENT_MODES, default="head")
+    train_cmd.add_argument("--encoder", default="sentence-transformers/all-MiniLM-L6-v2",
+                           help="model name or local directory")
+    train_cmd.add_argument("--epochs", type=int, default=None)
+    train_cmd.add_argument("--lr", type=float, default=None)
+    train_cmd.add_argument("--max-length", type=int, default=512)
+    train_cmd.add_argument("--batch-size", type=int, default=16)
+    train_cmd.add_argument("--seed", type=int, default=0)
+
+    eval_cmd = commands.add_parser("evaluate", help="agreement report on held-out windows")
+    eval_cmd.add_argument("--labels", default=DEFAULT_LABELS)
+    eval_cmd.add_argument("--student", default=NLP_STUDENT_DIR)
+    eval_cmd.add_argument("--output", help="write the JSON report here")
+    eval_cmd.add_argument("--batch-size", type=int, default=16)
+    eval_cmd.add_argument("--min-agreement", type=float, default=0.9,
+                          help="exit non-zero below this top-label agreement")
+
+    args = parser.parse_args()
+
+    if args.command == "label":
+        args.corpus = args.corpus or ["samples/*.eml"]
+        return label(args)
+    if args.command == "train":
+        # A linear head converges in many cheap epochs, fine-tuning in a few
+        if args.epochs is None:
+            args.epochs = 200 if args.mode == "head" else 3
+        return train(args)
+    return evaluate(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,228 @@
 import email
 from email import policy
-from email.parser import BytesParser
+from email.parser import BytesFeedParser, BytesHeaderParser
+from html.parser import HTMLParser
+
+from config import EML_MAX_MESSAGE_BYTES, EML_MAX_PART_BYTES, EML_MAX_BODY_CHARS
+from metrics import timer
+
+FEED_CHUNK_BYTES = 64 * 1024
 
 def parse_eml(file_path):
-    with open(file_path, "rb") as f:
-        msg = BytesParser(policy=policy.default).parse(f)
+    parsed = parse_eml_stream(file_path)
+    return parsed["headers"], parsed["body"]
+
+def parse_eml_headers(source, max_header_bytes=FEED_CHUNK_BYTES):
+    """
+    Headers only, from the first max_header_bytes of a path, raw
+    bytes or a seekable binary file object (rewound afterwards).
+    The body is neither decoded nor walked.
+    """
+
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            head = f.read(max_header_bytes)
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        head = bytes(source[:max_header_bytes])
+    else:
+        start = source.tell()
+        head = source.read(max_header_bytes)
+        source.seek(start)
+
+    return _extract_headers(BytesHeaderParser(policy=policy.default).parsebytes(head))
+
+def parse_eml_stream(source,
+                     max_message_bytes=EML_MAX_MESSAGE_BYTES,
+                     max_part_bytes=EML_MAX_PART_BYTES,
+                     max_body_chars=EML_MAX_BODY_CHARS) -> dict:
+    """
+    Size-bounded parse of a path, raw bytes or binary file object.
+    Input is fed to BytesFeedParser in chunks and cut at
+    max_message_bytes; attachments are listed but never decoded;
+    HTML parts are reduced to text with their href targets
+    collected separately. Returns:
+    {headers, body, links, attachments, truncated}
+    """
+
+    with timer("parse"):
+        parser = BytesFeedParser(policy=policy.default)
+        truncated = False
+
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            view = memoryview(source)
+            if len(view) > max_message_bytes:
+                view = view[:max_message_bytes]
+                truncated = True
+            for start in range(0, len(view), FEED_CHUNK_BYTES):
+                parser.feed(view[start:start + FEED_CHUNK_BYTES].tobytes())
+        elif isinstance(source, str):
+            with open(source, "rb") as f:
+                truncated = _feed_file(parser, f, max_message_bytes)
+        else:
+            truncated = _feed_file(parser, source, max_message_bytes)
+
+        msg = parser.close()
+
+        plain_parts = []
+        html_text = []
+        links = []
+        attachments = []
+        budget = max_body_chars
+
+        for part in _leaf_parts(msg):
+            content_type = part.get_content_type()
+            maintype = part.get_content_maintype()
+
+            raw = part.get_payload(decode=False)
+            size = len(raw) if isinstance(raw, (str, bytes)) else 0
+
+            if part.get_content_disposition() == "attachment" or maintype != "text":
+                attachments.append({
+                    "filename": part.get_filename(),
+                    "content_type": content_type,
+                    "encoded_size": size
+                })
+                continue
+
+            if size > max_part_bytes:
+                truncated = True
+                continue
+
+            if budget <= 0:
+                truncated = True
+                break
+
+            text = _decode_text(part)
+
+            if content_type == "text/html":
+                extractor = _HTMLTextExtractor()
+                extractor.feed(text)
+                extractor.close()
+                links.extend(extractor.links)
+                text = extractor.text()
+                html_text.append(text[:budget])
+            else:
+                plain_parts.append(text[:budget])
+
+            budget -= len(text)
 
+        # Plain text is what senders intend users to read; fall back to
+        # the HTML rendering only when there is none
+        body = "\n".join(plain_parts) if plain_parts else "\n".join(html_text)
+
+        return {
+            "headers": _extract_headers(msg),
+            "body": body,
+            "links": list(dict.fromkeys(links)),
+            "attachments": attachments,
+            "truncated": truncated
+        }
+
+def _leaf_parts(msg):
+    for part in msg.walk():
+        if part.is_multipart():
+            continue
+        if part.get_content_maintype() == "multipart":
+            recovered = _recover_multipart(part)
+            if recovered is not None:
+                yield from _leaf_parts(recovered)
+                continue
+        yield part
+
+def _recover_multipart(part):
+    """
+    A multipart whose declared boundary does not match the body parses
+    as one opaque part. Re-parse it using the boundary actually found
+    in the body.
+    """
+
+    payload = part.get_payload(decode=False)
+    if not isinstance(payload, str):
+        return None
+
+    for line in payload.splitlines():
+        if line.startswith("--") and len(line) > 2:
+            boundary = line[2:].strip()
+            break
+    else:
+        return None
+
+    recovered = email.message_from_string(
+        f'Content-Type: multipart/mixed; boundary="{boundary}"\n\n{payload}',
+        policy=policy.default
+    )
+    return recovered if recovered.is_multipart() else None
+
+def _feed_file(parser, f, max_message_bytes):
+    remaining = max_message_bytes
+    while remaining > 0:
+        chunk = f.read(min(FEED_CHUNK_BYTES, remaining))
+        if not chunk:
+            return False
+        parser.feed(chunk)
+        remaining -= len(chunk)
+    return bool(f.read(1))
+
+def _decode_text(part):
+    try:
+        return part.get_content()
+    except (KeyError, LookupError, ValueError):
+        # Unknown charset or malformed multipart: decode the bytes ourselves
+        payload = part.get_payload(decode=True) or b""
+        return payload.decode(part.get_content_charset() or "utf-8", errors="replace")
+
+def _extract_headers(msg):
     headers = {
     "from": str(msg.get("From")),
     "to": str(msg.get("To")),
     "subject": str(msg.get("Subject")),
     "reply_to": str(msg.get("Reply-To")),
-    "authentication-results": str(msg.get("Authentication-Results"))
+    # Every instance, topmost first, one per line
+    "authentication-results": _all_values(msg, "Authentication-Results"),
+    "arc-authentication-results": _all_values(msg, "ARC-Authentication-Results")
 }
+    return headers
 
-    body = ""
-    if msg.is_multipart():
-        for part in msg.walk():
-            if part.get_content_type() == "text/plain":
-                body += part.get_content()
-    else:
-        body = msg.get_content()
+def _all_values(msg, name):
+    return "\n".join(
+        " ".join(str(value).split()) for value in msg.get_all(name, [])
+    )
+
+class _HTMLTextExtractor(HTMLParser):
+    """
+    Visible text of an HTML body plus the href of every link
+    """
+
+    _SKIP = {"script", "style", "head", "title"}
+    _BREAK = {"br", "p", "div", "tr", "li", "h1", "h2", "h3", "h4", "h5", "h6", "table"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+        self._chunks = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP:
+            self._skip_depth += 1
+        elif tag in self._BREAK:
+            self._chunks.append("\n")
+
+        if tag == "a":
+            for name, value in attrs:
+                if name == "href" and value:
+                    self.links.append(value.strip())
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in self._BREAK:
+            self._chunks.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._chunks.append(data)
 
-    return headers, body
+    def text(self):
+        lines = (" ".join(line.split()) for line in "".join(self._chunks).splitlines())
+        return "\n".join(line for line in lines if line)
@@ -0,0 +1,184 @@
+# ======================================================
+# EXCEPTION CACHE
+# In-memory per-user sender allowlist over user_exceptions
+# ======================================================
+
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parseaddr
+
+from config import EXCEPTION_CACHE_USERS, EXCEPTION_CACHE_TTL_SECONDS
+from database import add_exception, load_exceptions
+
+
+def normalize_entry(value: str):
+    """
+    Classify an allowlist entry as ("address", "a@x.com"),
+    ("domain", "x.com") or ("suffix", "x.com") for "*.x.com".
+    Display names and case are dropped. Returns None for junk.
+    """
+
+    value = (value or "").strip().lower()
+    if value.startswith("*."):
+        return ("suffix", value[2:]) if "." in value[2:] else None
+    if value.startswith(("*@", "@")):
+        domain = value.split("@", 1)[1]
+        return ("domain", domain) if domain else None
+
+    address = normalize_address(value)
+    if address:
+        return ("address", address)
+    if value and "@" not in value and "." in value and " " not in value:
+        return ("domain", value)
+    return None
+
+
+def normalize_address(sender: str):
+    """
+    Bare lowercase address from a From header, e.g.
+    "Alice <A@X.com>" -> "a@x.com". Empty string if there is none.
+    """
+
+    _, address = parseaddr(sender or "")
+    address = address.strip().lower()
+    return address if "@" in address else ""
+
+
+class _UserAllowlist:
+    __slots__ = ("addresses", "domains", "suffixes", "loaded_at")
+
+    def __init__(self, entries, loaded_at):
+        self.addresses = set()
+        self.domains = set()
+        self.suffixes = set()
+        self.loaded_at = loaded_at
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry):
+        if entry is None:
+            return
+        kind, value = entry
+        if kind == "address":
+            self.addresses.add(value)
+        elif kind == "domain":
+            self.domains.add(value)
+        else:
+            self.suffixes.add(value)
+
+    def allows(self, address):
+        if address in self.addresses:
+            return True
+
+        domain = address.rsplit("@", 1)[1]
+        if domain in self.domains:
+            return True
+
+        if self.suffixes:
+            # "*.x.com" covers any subdomain of x.com, not x.com itself
+            labels = domain.split(".")
+            for i in range(1, len(labels) - 1):
+                if ".".join(labels[i:]) in self.suffixes:
+                    return True
+        return False
+
+
+class ExceptionCache:
+    """
+    A user's exceptions are loaded from the database on first use and
+    then checked with set lookups. add() writes to the database and
+    updates the loaded sets in the same call.
+    """
+
+    def __init__(self, max_users=EXCEPTION_CACHE_USERS,
+                 ttl_seconds=EXCEPTION_CACHE_TTL_SECONDS):
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+
+        self._users = OrderedDict()
+        # user -> one list per in-flight load, collecting entries add()ed
+        # after that load started reading the database
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def is_allowed(self, user_email, sender) -> bool:
+        address = normalize_address(sender)
+        if not address:
+            return False
+        return self._allowlist(user_email).allows(address)
+
+    def add(self, user_email, sender):
+        entry = normalize_entry(sender)
+        if entry is None:
+            return False
+
+        # Stored normalized, so the unique index also catches
+        # "Alice <a@x.com>" vs "a@x.com"
+        add_exception(user_email, entry[1] if entry[0] != "suffix" else "*." + entry[1])
+
+        with self._lock:
+            allowlist = self._users.get(user_email)
+            if allowlist is not None:
+                allowlist.add(entry)
+            for added in self._loading.get(user_email, ()):
+                added.append(entry)
+        return True
+
+    def invalidate(self, user_email=None):
+        with self._lock:
+            if user_email is None:
+                self._users.clear()
+            else:
+                self._users.pop(user_email, None)
+
+    def _allowlist(self, user_email):
+        now = time.monotonic()
+
+        with self._lock:
+            allowlist = self._users.get(user_email)
+            if allowlist is not None and now - allowlist.loaded_at <= self.ttl_seconds:
+                self._users.move_to_end(user_email)
+                return allowlist
+            added = []
+            self._loading.setdefault(user_email, []).append(added)
+
+        try:
+            # Rows written before normalization may still hold raw headers
+            allowlist = _UserAllowlist(
+                (normalize_entry(sender) for sender in load_exceptions(user_email)),
+                now
+            )
+        except Exception:
+            with self._lock:
+                self._end_load(user_email, added)
+            raise
+
+        with self._lock:
+            self._end_load(user_email, added)
+            # The load may have read the table before a concurrent add()
+            # committed; merge those entries so the stored set is not stale
+            for entry in added:
+                allowlist.add(entry)
+            self._users[user_email] = allowlist
+            self._users.move_to_end(user_email)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        return allowlist
+
+    def _end_load(self, user_email, added):
+        # By identity: two loads' lists can be equal
+        loads = [other for other in self._loading[user_email] if other is not added]
+        if loads:
+            self._loading[user_email] = loads
+        else:
+            del self._loading[user_email]
+
+
+_exception_cache = ExceptionCache()
+
+def is_sender_allowed(user_email, sender) -> bool:
+    return _exception_cache.is_allowed(user_email, sender)
+
+def allow_sender(user_email, sender) -> bool:
+    return _exception_cache.add(user_email, sender)
@@ -0,0 +1,145 @@
+from nlp_engine import run_nlp_batch
+from module3_decision_engine import run_decision_engine
+from config import (
+    LIVE_WINDOW_TOKENS,
+    LIVE_WINDOW_OVERLAP,
+    LIVE_AGGREGATION,
+    LIVE_DECAY
+)
+
+
+class IncrementalAnalyzer:
+    """
+    Scores a growing transcript one window at a time.
+    Only windows covering newly added tokens are sent to the
+    classifier, so per-chunk cost depends on the chunk length,
+    not on how long the call has been running.
+    """
+
+    def __init__(self, window_tokens=LIVE_WINDOW_TOKENS,
+                 overlap_tokens=LIVE_WINDOW_OVERLAP,
+                 aggregation=LIVE_AGGREGATION, decay=LIVE_DECAY,
+                 analyze_batch=run_nlp_batch):
+        if aggregation not in ("max", "decayed_mean"):
+            raise ValueError(f"Unknown aggregation: {aggregation}")
+        if not 0 <= overlap_tokens < window_tokens:
+            raise ValueError("overlap_tokens must be smaller than window_tokens")
+
+        self.window_tokens = window_tokens
+        self.stride = window_tokens - overlap_tokens
+        self.aggregation = aggregation
+        self.decay = decay
+        self.analyze_batch = analyze_batch
+
+        # Only the tail needed for the next window is kept;
+        # _offset is the absolute index of self._tokens[0]
+        self._tokens = []
+        self._offset = 0
+        self._scored_until = 0
+
+        self.windows = []
+
+        self._max_score = 0.0
+        self._max_intent = None
+        self._weighted_sum = 0.0
+        self._weight_total = 0.0
+        self._cues = set()
+
+    def add_text(self, text: str) -> dict:
+        """
+        Append a transcript chunk and return the call-level result
+        """
+
+        self._tokens.extend(text.split())
+        total = self._offset + len(self._tokens)
+
+        # Walk back from the newest token in steps of `stride` until the
+        # windows reach everything already scored
+        spans = []
+        end = total
+        while end > self._scored_until:
+            start = max(0, end - self.window_tokens)
+            spans.append((start, end))
+            if start <= self._scored_until:
+                break
+            end -= self.stride
+        spans.reverse()
+        self._scored_until = total
+
+        if spans:
+            texts = [
+                " ".join(self._tokens[start - self._offset:end - self._offset])
+                for start, end in spans
+            ]
+            for (start, end), nlp_result in zip(spans, self.analyze_batch(texts)):
+                self._add_window(start, end, nlp_result)
+
+            self._trim()
+
+        return self.current_result()
+
+    def current_result(self) -> dict:
+        nlp_result = self._aggregate()
+
+        behavioral_result = {
+            "behavioral_flags": [],
+            "behavioral_score": 0.0
+        }
+
+        decision = run_decision_engine(nlp_result, behavioral_result)
+
+        return {
+            "nlp_analysis": nlp_result,
+            "behavioral_analysis": behavioral_result,
+            "decision_engine": decision
+        }
+
+    def _add_window(self, start, end, nlp_result):
+        score = nlp_result["phishing_score"]
+        cues = nlp_result["detected_cues"]
+
+        self.windows.append({
+            "start": start,
+            "end": end,
+            "phishing_score": score,
+            "detected_cues": cues
+        })
+
+        if self._max_intent is None or score >= self._max_score:
+            self._max_score = score
+            self._max_intent = nlp_result["top_intent"]
+
+        # Running decayed mean: older windows fade by `decay` per new window
+        self._weighted_sum = self._weighted_sum * self.decay + score
+        self._weight_total = self._weight_total * self.decay + 1.0
+
+        self._cues.update(cues)
+
+    def _aggregate(self) -> dict:
+        if not self.windows:
+            score = 0.0
+        elif self.aggregation == "max":
+            score = self._max_score
+        else:
+            score = self._weighted_sum / self._weight_total
+
+        score = round(score, 2)
+
+        return {
+            "phishing_score": score,
+            "detected_cues": sorted(self._cues),
+            "top_intent": self._max_intent or "no speech",
+            "confidence": (
+                "high" if score > 0.75
+                else "medium" if score > 0.4
+                else "low"
+            ),
+            "windows_scored": len(self.windows)
+        }
+
+    def _trim(self):
+        keep_from = max(0, self._scored_until - self.window_tokens)
+        drop = keep_from - self._offset
+        if drop > 0:
+            del self._tokens[:drop]
+            self._offset = keep_from
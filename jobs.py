@@ -0,0 +1,119 @@
+# ======================================================
+# JOBS
+# In-process job queue for long-running analyses
+# ======================================================
+
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config import JOB_LIMITS, JOB_RESULT_TTL_SECONDS
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobManager:
+    """
+    Each job kind ("email", "voice", ...) gets its own worker pool and
+    pending-job limit, so slow voice transcriptions cannot starve
+    email triage. Jobs live in memory: a job id is only known to the
+    process that accepted it. Finished jobs are dropped after
+    ttl_seconds.
+    """
+
+    def __init__(self, limits=JOB_LIMITS, ttl_seconds=JOB_RESULT_TTL_SECONDS):
+        # kind -> (workers, max pending)
+        self.limits = dict(limits)
+        self.ttl_seconds = ttl_seconds
+
+        self._pools = {
+            kind: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"job-{kind}")
+            for kind, (workers, _) in self.limits.items()
+        }
+        self._pending = {kind: 0 for kind in self.limits}
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, owner, func, *args, **kwargs) -> str:
+        if kind not in self._pools:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        self._expire()
+
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            if self._pending[kind] >= self.limits[kind][1]:
+                raise QueueFull(f"Too many pending {kind} jobs")
+            self._pending[kind] += 1
+            self._jobs[job_id] = {
+                "id": job_id,
+                "kind": kind,
+                "owner": owner,
+                "status": "queued",
+                "created_at": time.time(),
+                "finished_at": None,
+                "result": None,
+                "error": None
+            }
+
+        self._pools[kind].submit(self._run, job_id, func, args, kwargs)
+        return job_id
+
+    def get(self, job_id, owner=None):
+        """
+        A copy of the job, or None if it is unknown, expired or
+        belongs to someone else
+        """
+
+        self._expire()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or (owner is not None and job["owner"] != owner):
+                return None
+            return dict(job)
+
+    def shutdown(self, wait=True):
+        for pool in self._pools.values():
+            pool.shutdown(wait=wait)
+
+    def _run(self, job_id, func, args, kwargs):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["status"] = "running"
+            job["started_at"] = time.time()
+
+        try:
+            result, error, status = func(*args, **kwargs), None, "done"
+        except Exception as e:
+            traceback.print_exc()
+            result, error, status = None, f"{type(e).__name__}: {e}", "failed"
+
+        with self._lock:
+            job.update(status=status, result=result, error=error, finished_at=time.time())
+            self._pending[job["kind"]] -= 1
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job["finished_at"] is not None and job["finished_at"] < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+_job_manager = JobManager()
+
+def get_job_manager() -> JobManager:
+    return _job_manager
+
+def submit_job(kind, owner, func, *args, **kwargs) -> str:
+    return _job_manager.submit(kind, owner, func, *args, **kwargs)
+
+def get_job(job_id, owner=None):
+    return _job_manager.get(job_id, owner)
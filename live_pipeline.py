@@ -0,0 +1,377 @@
+# ======================================================
+# LIVE PIPELINE
+# capture -> transcribe -> classify, each on its own thread
+# ======================================================
+
+import queue
+import threading
+import time
+import wave
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+_SENTINEL = object()
+
+
+# ======================================================
+# RING BUFFER
+# ======================================================
+
+class AudioRingBuffer:
+    """
+    Fixed-size float32 sample buffer between the capture callback
+    and the transcription worker. Writes never allocate; if the
+    reader falls more than `capacity` samples behind, the oldest
+    samples are overwritten and counted in `overruns`.
+    """
+
+    def __init__(self, capacity_seconds, sample_rate=SAMPLE_RATE):
+        self.capacity = int(capacity_seconds * sample_rate)
+        self._buffer = np.zeros(self.capacity, dtype=np.float32)
+
+        # Absolute sample counters, never wrapped
+        self._written = 0
+        self._read = 0
+
+        self.overruns = 0
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def available(self):
+        with self._cond:
+            return self._written - self._read
+
+    def write(self, samples, block=False):
+        """
+        Append samples. With block=True wait for the reader to make
+        room instead of overwriting (used by file sources).
+        """
+
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+
+        if block and len(samples) > self.capacity:
+            for start in range(0, len(samples), self.capacity):
+                self.write(samples[start:start + self.capacity], block=True)
+            return
+
+        with self._cond:
+            if block:
+                self._cond.wait_for(
+                    lambda: self.closed
+                    or self.capacity - (self._written - self._read) >= len(samples)
+                )
+                if self.closed:
+                    return
+
+            if len(samples) > self.capacity:
+                skipped = len(samples) - self.capacity
+                samples = samples[skipped:]
+                self._written += skipped
+
+            n = len(samples)
+            start = self._written % self.capacity
+            first = min(n, self.capacity - start)
+            self._buffer[start:start + first] = samples[:first]
+            self._buffer[:n - first] = samples[first:]
+            self._written += n
+
+            lag = self._written - self._read
+            if lag > self.capacity:
+                self.overruns += lag - self.capacity
+                self._read = self._written - self.capacity
+
+            self._cond.notify_all()
+
+    def read(self, n, timeout=None):
+        """
+        Return exactly n samples, or fewer once the buffer is closed.
+        Returns None if n samples did not arrive within `timeout`.
+        """
+
+        with self._cond:
+            ready = self._cond.wait_for(
+                lambda: self._written - self._read >= n or self.closed,
+                timeout
+            )
+            if not ready:
+                return None
+
+            n = min(n, self._written - self._read)
+            out = np.empty(n, dtype=np.float32)
+            start = self._read % self.capacity
+            first = min(n, self.capacity - start)
+            out[:first] = self._buffer[start:start + first]
+            out[first:] = self._buffer[:n - first]
+            self._read += n
+
+            self._cond.notify_all()
+            return out
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+# ======================================================
+# AUDIO SOURCES
+# ======================================================
+
+class MicrophoneSource:
+    """
+    Callback-driven sounddevice input stream. The callback only
+    copies samples into the ring buffer, so capture continues
+    while the workers are busy.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, device=None, blocksize=1024):
+        self.sample_rate = sample_rate
+        self.device = device
+        self.blocksize = blocksize
+        self.status_errors = 0
+        self._stream = None
+
+    def start(self, ring):
+        # Imported here so file sources work without an audio device
+        import sounddevice as sd
+
+        def callback(indata, frames, time_info, status):
+            if status:
+                self.status_errors += 1
+            ring.write(indata[:, 0])
+
+        self._stream = sd.InputStream(
+            samplerate=self.sample_rate,
+            channels=1,
+            dtype="float32",
+            device=self.device,
+            blocksize=self.blocksize,
+            callback=callback
+        )
+        self._stream.start()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+class WavFileSource:
+    """
+    Feeds a PCM WAV file through the pipeline in place of the sound
+    device. With realtime=True blocks are paced at playback speed,
+    otherwise the file is pushed as fast as the workers consume it.
+    """
+
+    def __init__(self, path, sample_rate=SAMPLE_RATE, blocksize=1024, realtime=False):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        self.realtime = realtime
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, ring):
+        self._thread = threading.Thread(target=self._run, args=(ring,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self, ring):
+        try:
+            audio = read_wav(self.path, self.sample_rate)
+            for start in range(0, len(audio), self.blocksize):
+                if self._stop.is_set():
+                    break
+                block = audio[start:start + self.blocksize]
+                ring.write(block, block=not self.realtime)
+                if self.realtime:
+                    time.sleep(len(block) / self.sample_rate)
+        finally:
+            ring.close()
+
+
+def read_wav(path, sample_rate=SAMPLE_RATE):
+    """
+    Load a PCM WAV file (path or binary file object) as mono
+    float32 at `sample_rate`
+    """
+
+    with wave.open(path, "rb") as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        rate = wav.getframerate()
+        frames = wav.readframes(wav.getnframes())
+
+    if width == 1:
+        audio = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        audio = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768
+    elif width == 4:
+        audio = np.frombuffer(frames, dtype="<i4").astype(np.float32) / 2147483648
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width}")
+
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+
+    if rate != sample_rate and len(audio):
+        duration = len(audio) / rate
+        target = np.arange(int(duration * sample_rate)) / sample_rate
+        audio = np.interp(target, np.arange(len(audio)) / rate, audio)
+
+    return audio.astype(np.float32)
+
+
+# ======================================================
+# PIPELINE
+# ======================================================
+
+class LiveVishingPipeline:
+    """
+    Three-stage streaming pipeline:
+    - source callback writes into an AudioRingBuffer
+    - transcription worker reads fixed-size chunks and calls `transcribe`,
+      or, with a `chunker` (vad.SpeechChunker), only on voiced utterances
+    - classification worker feeds text into `analyzer.add_text`
+    Transcripts travel over a bounded queue whose overflow policy is
+    either "block" (backpressure on transcription) or "drop_oldest".
+    """
+
+    def __init__(self, source, transcribe, analyzer,
+                 chunk_seconds=8, sample_rate=SAMPLE_RATE,
+                 buffer_seconds=120, text_queue_size=8,
+                 queue_policy="block", on_result=None,
+                 stop_on_block=True, chunker=None):
+        if queue_policy not in ("block", "drop_oldest"):
+            raise ValueError(f"Unknown queue policy: {queue_policy}")
+
+        self.source = source
+        self.transcribe = transcribe
+        self.analyzer = analyzer
+        self.chunker = chunker
+        self.chunk_samples = int(chunk_seconds * sample_rate)
+        self.queue_policy = queue_policy
+        self.on_result = on_result
+        self.stop_on_block = stop_on_block
+
+        self.ring = AudioRingBuffer(buffer_seconds, sample_rate)
+        self.text_queue = queue.Queue(maxsize=text_queue_size)
+
+        self.results = []
+        self.dropped_transcripts = 0
+
+        self._stop = threading.Event()
+        self._workers = []
+
+    def start(self):
+        self._workers = [
+            threading.Thread(target=self._transcription_worker, daemon=True),
+            threading.Thread(target=self._classification_worker, daemon=True)
+        ]
+        for worker in self._workers:
+            worker.start()
+        self.source.start(self.ring)
+
+    def stop(self):
+        self._stop.set()
+        # Close first so a file source blocked on a full buffer can exit
+        self.ring.close()
+        self.source.stop()
+
+    def join(self, timeout=None):
+        for worker in self._workers:
+            worker.join(timeout)
+
+    def run(self):
+        """
+        Start the pipeline and block until the source is exhausted,
+        a BLOCK decision stops it, or Ctrl+C is pressed
+        """
+
+        self.start()
+        try:
+            while any(worker.is_alive() for worker in self._workers):
+                self.join(timeout=0.2)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            self.join()
+        return self.results
+
+    def _transcription_worker(self):
+        try:
+            while not self._stop.is_set():
+                audio = self.ring.read(self.chunk_samples, timeout=0.5)
+                if audio is None:
+                    continue
+                last = len(audio) < self.chunk_samples
+
+                if self.chunker is None:
+                    utterances = [audio] if len(audio) else []
+                else:
+                    utterances = self.chunker.feed(audio)
+                    if last:
+                        utterances += self.chunker.flush()
+
+                for utterance in utterances:
+                    text = self.transcribe(utterance)
+                    if text:
+                        self._put_text(text)
+
+                if last:
+                    break
+        finally:
+            self._put_text(_SENTINEL, force=True)
+
+    def _classification_worker(self):
+        while True:
+            try:
+                text = self.text_queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return
+                continue
+
+            if text is _SENTINEL:
+                return
+
+            result = self.analyzer.add_text(text)
+            self.results.append(result)
+
+            if self.on_result is not None:
+                self.on_result(text, result)
+
+            if self.stop_on_block and result["decision_engine"]["decision"] == "BLOCK":
+                self.stop()
+                return
+
+    def _put_text(self, item, force=False):
+        if self.queue_policy == "block":
+            while not self._stop.is_set():
+                try:
+                    self.text_queue.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+            # Stopped: only the end-of-stream marker still has to get through
+            if not force:
+                return
+
+        while True:
+            try:
+                self.text_queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.text_queue.get_nowait()
+                    self.dropped_transcripts += 1
+                except queue.Empty:
+                    pass
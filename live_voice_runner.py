@@ -1,73 +1,84 @@
-import sounddevice as sd
-import numpy as np
-import whisper
-import time
+import sys
 
-from module3_runner import run_module_3_from_text
+from incremental_analyzer import IncrementalAnalyzer
+from live_pipeline import LiveVishingPipeline, MicrophoneSource, WavFileSource
+from model_registry import register_model, get_model
+from vad import SpeechChunker
 SAMPLE_RATE = 16000
+# Audio is pulled from the ring buffer in small blocks; the VAD then
+# cuts utterances at pauses, up to CHUNK_SECONDS long
+READ_SECONDS = 1
 CHUNK_SECONDS = 8
 MODEL_SIZE = "base"
+INPUT_DEVICE = 1
 
-sd.default.device = 1
+def _load_whisper_base():
+    import whisper
+    return whisper.load_model(MODEL_SIZE)
 
-print("[INFO] Loading Whisper model...")
-model = whisper.load_model(MODEL_SIZE)
-print("[INFO] Whisper model loaded.")
+register_model("whisper-base", _load_whisper_base)
 
-def live_vishing_detection():
-    print("\nLIVE VISHING DETECTION STARTED")
-    print("Listening to call audio (speaker).")
-    print("Press Ctrl+C to stop.\n")
+def transcribe_chunk(audio) -> str:
+    result = get_model("whisper-base").transcribe(
+        audio,
+        fp16=False,
+        language="en",
+        condition_on_previous_text=True
+    )
+    return result.get("text", "").strip()
 
-    transcript_so_far = ""
+def print_result(chunk_text, analysis):
+    print("\n📝 LIVE TRANSCRIPT:")
+    print(chunk_text)
 
-    try:
-        while True:
-            print("⏳ Listening...")
+    decision = analysis["decision_engine"]["decision"]
+    risk = analysis["decision_engine"]["final_risk_score"]
 
-            audio = sd.rec(
-                int(CHUNK_SECONDS * SAMPLE_RATE),
-                samplerate=SAMPLE_RATE,
-                channels=1,
-                dtype="float32"
-            )
-            sd.wait()
-            audio = audio.flatten()
-            max_amp = np.max(np.abs(audio))
-            print(f"[DEBUG] Audio amplitude: {max_amp:.4f}")
-            if max_amp < 0.005:
-                print("[INFO] Silence detected, skipping...")
-                continue
-            result = model.transcribe(
-                audio,
-                fp16=False,
-                language="en",
-                condition_on_previous_text=True
-            )
+    print("\n⚠️ CURRENT DECISION:", decision)
+    print("📊 RISK SCORE:", risk)
 
-            chunk_text = result.get("text", "").strip()
+    if decision == "BLOCK":
+        print("\n🚨 PHISHING DETECTED — TERMINATE CALL 🚨")
 
-            if chunk_text:
-                transcript_so_far += " " + chunk_text
+def live_vishing_detection(source=None):
+    """
+    Capture, transcription and classification run concurrently,
+    so audio keeps being recorded while Whisper and the classifier
+    work on the previous chunk. Pass a WavFileSource to replay a
+    recording instead of listening to the sound device.
+    """
 
-                print("\n📝 LIVE TRANSCRIPT:")
-                print(transcript_so_far.strip())
-                analysis = run_module_3_from_text(transcript_so_far)
-                decision = analysis["decision_engine"]["decision"]
-                risk = analysis["decision_engine"]["final_risk_score"]
+    if source is None:
+        source = MicrophoneSource(SAMPLE_RATE, device=INPUT_DEVICE)
 
-                print("\n⚠️ CURRENT DECISION:", decision)
-                print("📊 RISK SCORE:", risk)
+    # Load both models before the first chunk arrives
+    print("[INFO] Loading models...")
+    get_model("whisper-base")
+    get_model("nlp")
+    print("[INFO] Models loaded.")
 
-                if decision == "BLOCK":
-                    print("\n🚨 PHISHING DETECTED — TERMINATE CALL 🚨")
-                    break
+    print("\nLIVE VISHING DETECTION STARTED")
+    print("Listening to call audio (speaker).")
+    print("Press Ctrl+C to stop.\n")
 
-            time.sleep(0.5)
+    pipeline = LiveVishingPipeline(
+        source,
+        transcribe_chunk,
+        IncrementalAnalyzer(),
+        chunk_seconds=READ_SECONDS,
+        sample_rate=SAMPLE_RATE,
+        on_result=print_result,
+        chunker=SpeechChunker(SAMPLE_RATE, max_segment_seconds=CHUNK_SECONDS)
+    )
+    pipeline.run()
 
-    except KeyboardInterrupt:
-        print("\n🛑 Live detection stopped by user.")
+    if pipeline.ring.overruns:
+        print(f"[WARN] {pipeline.ring.overruns} samples dropped (workers fell behind)")
+    print("\n🛑 Live detection stopped.")
 
 
 if __name__ == "__main__":
-    live_vishing_detection()
+    if len(sys.argv) > 1:
+        live_vishing_detection(WavFileSource(sys.argv[1], SAMPLE_RATE))
+    else:
+        live_vishing_detection()
@@ -0,0 +1,181 @@
+# ======================================================
+# LOGIN SECURITY
+# Bounded bcrypt pool, cost upgrades and attempt throttling
+# ======================================================
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from config import (
+    BCRYPT_ROUNDS,
+    AUTH_HASH_WORKERS,
+    AUTH_HASH_QUEUE,
+    AUTH_THROTTLE_WINDOW_SECONDS,
+    AUTH_MAX_FAILURES_PER_ACCOUNT,
+    AUTH_MAX_ATTEMPTS_PER_IP
+)
+from database import create_user, user_exists, get_password_hash, set_password_hash
+
+
+class LoginThrottled(Exception):
+    pass
+
+
+class HashPoolBusy(Exception):
+    pass
+
+
+class _SlidingWindow:
+    """
+    Per-key event timestamps within the last window_seconds
+    """
+
+    # Past this many keys, stale ones are swept on the next record()
+    MAX_KEYS = 10_000
+
+    def __init__(self, limit, window_seconds):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def exceeded(self, key):
+        with self._lock:
+            events = self._events.get(key)
+            return events is not None and len(self._prune(events, time.monotonic())) >= self.limit
+
+    def record(self, key):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._events) > self.MAX_KEYS:
+                self._sweep(now)
+            self._prune(self._events.setdefault(key, deque()), now).append(now)
+
+    def reset(self, key):
+        with self._lock:
+            self._events.pop(key, None)
+
+    def _prune(self, events, now):
+        cutoff = now - self.window_seconds
+        while events and events[0] < cutoff:
+            events.popleft()
+        return events
+
+    def _sweep(self, now):
+        cutoff = now - self.window_seconds
+        self._events = {
+            key: events for key, events in self._events.items()
+            if events and events[-1] >= cutoff
+        }
+
+
+class LoginGuard:
+    """
+    bcrypt runs on a small dedicated pool instead of the request
+    thread, so login bursts are capped at `workers` cores. Attempts
+    beyond the pool plus a short queue are refused, and throttled
+    accounts / IPs are refused before any hashing happens.
+    """
+
+    def __init__(self, rounds=BCRYPT_ROUNDS, workers=AUTH_HASH_WORKERS,
+                 queue_size=AUTH_HASH_QUEUE,
+                 window_seconds=AUTH_THROTTLE_WINDOW_SECONDS,
+                 max_account_failures=AUTH_MAX_FAILURES_PER_ACCOUNT,
+                 max_ip_attempts=AUTH_MAX_ATTEMPTS_PER_IP):
+        self.rounds = rounds
+
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+        # Checked against when the account does not exist, so unknown
+        # and known emails take the same time. Made on first use.
+        self._dummy_hash = None
+
+        self._account_failures = _SlidingWindow(max_account_failures, window_seconds)
+        self._ip_attempts = _SlidingWindow(max_ip_attempts, window_seconds)
+
+    def authenticate(self, email, password, ip=None) -> bool:
+        """
+        True for a correct password. Raises LoginThrottled or
+        HashPoolBusy without hashing when the attempt is refused.
+        """
+
+        email = email or ""
+        self._check_throttle(email, ip)
+
+        stored = get_password_hash(email)
+        ok = self._run(self._verify, password or "", stored)
+
+        if not ok:
+            self._account_failures.record(email)
+            return False
+
+        self._account_failures.reset(email)
+        if _hash_rounds(stored) != self.rounds:
+            # Cost factor changed since this hash was made. Best effort:
+            # the password is verified, so a busy pool only defers it
+            try:
+                set_password_hash(email, self._run(self._hash, password))
+            except HashPoolBusy:
+                pass
+        return True
+
+    def register(self, email, password, ip=None) -> bool:
+        """
+        False if the email is taken
+        """
+
+        email = email or ""
+        self._check_throttle(None, ip)
+
+        if user_exists(email):
+            return False
+        return create_user(email, self._run(self._hash, password or ""))
+
+    def _check_throttle(self, email, ip):
+        if email and self._account_failures.exceeded(email):
+            raise LoginThrottled("Too many failed attempts for this account, try again later")
+        if ip:
+            if self._ip_attempts.exceeded(ip):
+                raise LoginThrottled("Too many attempts from this address, try again later")
+            self._ip_attempts.record(ip)
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashPoolBusy("Login service is busy, try again shortly")
+        try:
+            return self._pool.submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def _hash(self, password):
+        return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=self.rounds))
+
+    def _verify(self, password, stored):
+        if stored is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = self._hash("decepta-dummy")
+            bcrypt.checkpw(password.encode(), self._dummy_hash)
+            return False
+        return bcrypt.checkpw(password.encode(), stored)
+
+
+def _hash_rounds(stored):
+    # "$2b$12$..." -> 12
+    try:
+        return int(stored[4:6])
+    except (TypeError, ValueError):
+        return None
+
+
+_login_guard = LoginGuard()
+
+def authenticate_user(email, password, ip=None) -> bool:
+    return _login_guard.authenticate(email, password, ip)
+
+def register_user(email, password, ip=None) -> bool:
+    return _login_guard.register(email, password, ip)
@@ -0,0 +1,38 @@
+# ======================================================
+# API TOKENS
+# Issue and revoke tokens for the JSON API
+# ======================================================
+
+import argparse
+import sys
+
+from database import migrate, create_api_token, revoke_api_token
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage /api/v1 tokens")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create = commands.add_parser("create", help="issue a token for a user")
+    create.add_argument("user_email")
+    create.add_argument("--name", default="", help="label, e.g. the gateway host")
+
+    revoke = commands.add_parser("revoke", help="revoke a token")
+    revoke.add_argument("token")
+
+    args = parser.parse_args()
+    migrate()
+
+    if args.command == "create":
+        # Shown once; only its hash is stored
+        print(create_api_token(args.user_email, args.name))
+        return 0
+
+    if not revoke_api_token(args.token):
+        print("Unknown token", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
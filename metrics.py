@@ -0,0 +1,258 @@
+# ======================================================
+# METRICS
+# Stage timers, counters and histograms for /metrics
+# ======================================================
+
+import threading
+import time
+from contextlib import contextmanager
+
+from config import METRICS_ENABLED, RESULT_TIMINGS
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (32, 64, 128, 256, 384, 512, 768, 1024)
+
+# name: (type, help, histogram buckets)
+DEFINITIONS = {
+    "decepta_stage_duration_seconds": (
+        "histogram", "Time spent per pipeline stage", LATENCY_BUCKETS
+    ),
+    "decepta_classifier_input_tokens": (
+        "histogram", "Tokens per (text, hypothesis) pair sent to the classifier", TOKEN_BUCKETS
+    ),
+    "decepta_classifier_truncated_total": (
+        "counter", "Texts cut to the classifier's maximum length", None
+    ),
+    "decepta_model_load_seconds": (
+        "gauge", "Time taken to load each model", None
+    ),
+    "decepta_result_cache_lookups_total": (
+        "counter", "Result cache lookups by outcome", None
+    ),
+    "decepta_cascade_total": (
+        "counter", "Messages by whether the classifier ran", None
+    ),
+    "decepta_decisions_total": (
+        "counter", "Final decisions by pipeline", None
+    ),
+    "decepta_analysis_rows_total": (
+        "counter", "Analysis rows written by the background writer", None
+    )
+}
+
+
+class _Metric:
+    __slots__ = ("name", "kind", "help", "buckets", "values", "lock")
+
+    def __init__(self, name, kind, help_text, buckets):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.buckets = buckets
+        # label tuple -> value, or [bucket counts, sum, count] for histograms
+        self.values = {}
+        self.lock = threading.Lock()
+
+
+class _TimingCollector:
+    """
+    Stage durations for the work done on one thread, e.g. one request
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def as_dict(self):
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1e3, 3),
+            "stages_ms": {stage: round(s * 1e3, 3) for stage, s in self.stages.items()}
+        }
+
+
+class _StageTimer:
+    __slots__ = ("metrics", "stage", "started")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record_stage(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """
+    In-process metric store rendered in the Prometheus text format.
+    When disabled, count / observe / set_gauge return at once and
+    timer() hands back a shared no-op context manager, unless result
+    timings are being collected on the calling thread.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED, result_timings=RESULT_TIMINGS,
+                 definitions=DEFINITIONS):
+        self.enabled = enabled
+        self.result_timings = result_timings
+        self._metrics = {
+            name: _Metric(name, kind, help_text, buckets)
+            for name, (kind, help_text, buckets) in definitions.items()
+        }
+        self._local = threading.local()
+
+    def count(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        metric = self._metrics[name]
+        key = tuple(sorted(labels.items()))
+        with metric.lock:
+            metric.values[key] = metric.values.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        if not self.enabled:
+            return
+        metric = self._metrics[name]
+        with metric.lock:
+            metric.values[tuple(sorted(labels.items()))] = value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        metric = self._metrics[name]
+        key = tuple(sorted(labels.items()))
+        with metric.lock:
+            entry = metric.values.get(key)
+            if entry is None:
+                entry = metric.values[key] = [[0] * len(metric.buckets), 0.0, 0]
+            counts = entry[0]
+            for i, bound in enumerate(metric.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def timer(self, stage):
+        if self.enabled or (
+            self.result_timings and getattr(self._local, "collector", None) is not None
+        ):
+            return _StageTimer(self, stage)
+        return _NULL_TIMER
+
+    def record_stage(self, stage, seconds):
+        self.observe("decepta_stage_duration_seconds", seconds, stage=stage)
+        collector = getattr(self._local, "collector", None)
+        if collector is not None:
+            collector.add(stage, seconds)
+
+    @contextmanager
+    def collect_timings(self):
+        """
+        Yields a collector for the stages timed on this thread (the
+        enclosing one when nested), or None when result timings are off
+        """
+
+        if not self.result_timings:
+            yield None
+            return
+
+        outer = getattr(self._local, "collector", None)
+        if outer is not None:
+            yield outer
+            return
+
+        collector = self._local.collector = _TimingCollector()
+        try:
+            yield collector
+        finally:
+            self._local.collector = None
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            with metric.lock:
+                values = list(metric.values.items())
+                if metric.kind == "histogram":
+                    values = [(key, (list(e[0]), e[1], e[2])) for key, e in values]
+
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+
+            for key, value in sorted(values):
+                if metric.kind != "histogram":
+                    lines.append(f"{metric.name}{_labels(key)} {_number(value)}")
+                    continue
+                counts, total, observations = value
+                cumulative = 0
+                for bound, n in zip(metric.buckets, counts):
+                    cumulative += n
+                    lines.append(
+                        f"{metric.name}_bucket{_labels(key + (('le', _number(bound)),))} {cumulative}"
+                    )
+                lines.append(f"{metric.name}_bucket{_labels(key + (('le', '+Inf'),))} {observations}")
+                lines.append(f"{metric.name}_sum{_labels(key)} {_number(total)}")
+                lines.append(f"{metric.name}_count{_labels(key)} {observations}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _labels(key):
+    if not key:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n"))
+        for name, value in key
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _number(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+_metrics = Metrics()
+
+def get_metrics() -> Metrics:
+    return _metrics
+
+def metrics_enabled() -> bool:
+    return _metrics.enabled
+
+def timer(stage):
+    return _metrics.timer(stage)
+
+def count(name, amount=1, **labels):
+    _metrics.count(name, amount, **labels)
+
+def observe(name, value, **labels):
+    _metrics.observe(name, value, **labels)
+
+def set_gauge(name, value, **labels):
+    _metrics.set_gauge(name, value, **labels)
+
+def collect_timings():
+    return _metrics.collect_timings()
+
+def render_metrics() -> str:
+    return _metrics.render()
@@ -0,0 +1,132 @@
+# ======================================================
+# MODEL REGISTRY
+# Lazy, thread-safe, load-once access to heavy models
+# ======================================================
+
+import os
+import threading
+import time
+
+from metrics import set_gauge
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def _rss_bytes():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class ModelRegistry:
+    """
+    Modules register a loader under a name at import time; the model
+    itself is only built on the first get() and then shared by every
+    caller in the process.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._locks = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, loader):
+        with self._lock:
+            self._loaders[name] = loader
+            self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        if name not in self._loaders:
+            raise KeyError(f"No model registered under '{name}'")
+
+        with self._locks[name]:
+            model = self._models.get(name)
+            if model is not None:
+                return model
+
+            rss_before = _rss_bytes()
+            started = time.perf_counter()
+            model = self._loaders[name]()
+            load_seconds = time.perf_counter() - started
+            rss_after = _rss_bytes()
+
+            self._stats[name] = {
+                "load_seconds": round(load_seconds, 3),
+                "rss_delta_mb": (
+                    round((rss_after - rss_before) / 2**20, 1)
+                    if rss_before is not None and rss_after is not None
+                    else None
+                )
+            }
+            set_gauge("decepta_model_load_seconds", load_seconds, model=name)
+            self._models[name] = model
+            return model
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def warm_up(self, names=None, background=True):
+        """
+        Load the given models (default: all registered) ahead of the
+        first request. With background=True this returns the loading
+        thread immediately.
+        """
+
+        names = list(self._loaders) if names is None else list(names)
+
+        def load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"[WARN] Warm-up of '{name}' failed: {e}")
+
+        if not background:
+            load_all()
+            return None
+
+        thread = threading.Thread(target=load_all, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def report(self):
+        """
+        Load state, load time and resident-memory growth per model
+        """
+
+        return [
+            {
+                "name": name,
+                "loaded": name in self._models,
+                **self._stats.get(name, {"load_seconds": None, "rss_delta_mb": None})
+            }
+            for name in self._loaders
+        ]
+
+
+_registry = ModelRegistry()
+
+def register_model(name, loader):
+    _registry.register(name, loader)
+
+def get_model(name):
+    return _registry.get(name)
+
+def warm_up(names=None, background=True):
+    return _registry.warm_up(names, background)
+
+def model_report():
+    return _registry.report()
@@ -1,9 +1,9 @@
 from eml_parser import parse_eml
-from nlp_engine import PhishingNLPModule
+from nlp_engine import get_nlp_engine
 
 def run_module_1(eml_path):
     headers, body = parse_eml(eml_path)
-    nlp_engine = PhishingNLPModule()
+    nlp_engine = get_nlp_engine()
     return nlp_engine.analyze_email(headers, body)
 
 if __name__ == "__main__":
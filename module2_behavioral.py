@@ -1,7 +1,7 @@
 import re
 from urllib.parse import urlparse
 class BehavioralAnalyzer:
-    def analyze(self, headers: dict, body: str) -> dict:
+    def analyze(self, headers: dict, body: str, links=None) -> dict:
         flags = []
         score = 0.0
 
@@ -13,6 +13,13 @@ class BehavioralAnalyzer:
             score += 0.2
 
         urls = re.findall(r'https?://\S+', body)
+        # HTML href targets are often hidden behind innocent link text
+        if links:
+            seen = set(urls)
+            urls += [
+                link for link in links
+                if link.lower().startswith(("http://", "https://")) and link not in seen
+            ]
 
         for url in urls:
             parsed = urlparse(url)
@@ -34,5 +41,5 @@ class BehavioralAnalyzer:
 
 _behavior_engine = BehavioralAnalyzer()
 
-def run_behavioral(headers: dict, body: str) -> dict:
-    return _behavior_engine.analyze(headers, body)
+def run_behavioral(headers: dict, body: str, links=None) -> dict:
+    return _behavior_engine.analyze(headers, body, links)
@@ -1,10 +1,10 @@
 from eml_parser import parse_eml
-from nlp_engine import PhishingNLPModule
+from nlp_engine import get_nlp_engine
 from module2_behavioral import BehavioralAnalyzer
 
 def run_module_2(eml_path):
     headers, body = parse_eml(eml_path)
-    nlp_engine = PhishingNLPModule()
+    nlp_engine = get_nlp_engine()
     nlp_result = nlp_engine.analyze_email(headers, body)
     behavioral_engine = BehavioralAnalyzer()
     behavioral_result = behavioral_engine.analyze(headers, body)
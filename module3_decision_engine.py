@@ -1,12 +1,25 @@
+from config import REPUTATION_WEIGHT, AUTH_WEIGHT
+from sender_reputation import applied_verdict
+
+SEVERITY = {"ALLOW": 0, "WARN": 1, "BLOCK": 2}
+
 class DecisionEngine:
-    def decide(self, nlp_result: dict, behavioral_result: dict) -> dict:
+    def decide(self, nlp_result: dict, behavioral_result: dict,
+               reputation: dict = None, auth_result: dict = None) -> dict:
 
         nlp_score = nlp_result.get("phishing_score", 0.0)
         behavioral_score = behavioral_result.get("behavioral_score", 0.0)
 
-        final_risk_score = round(
-            (0.7 * nlp_score) + (0.3 * behavioral_score), 2
-        )
+        final_risk_score = (0.7 * nlp_score) + (0.3 * behavioral_score)
+
+        # Sender history can only raise the risk, never clear a message
+        if reputation:
+            final_risk_score += REPUTATION_WEIGHT * reputation["risk"]
+
+        if auth_result:
+            final_risk_score += AUTH_WEIGHT * auth_result["auth_risk_score"]
+
+        final_risk_score = round(min(final_risk_score, 1.0), 2)
 
         detected_cues = set(nlp_result.get("detected_cues", []))
         high_risk_cues = {
@@ -28,6 +41,16 @@ class DecisionEngine:
             else:
                 decision = "ALLOW"
 
+        # A known-bad sender domain sets the minimum decision, unless
+        # the message authenticated as that domain
+        reputation_verdict = applied_verdict(reputation, auth_result)
+        if reputation_verdict and SEVERITY[reputation_verdict] > SEVERITY[decision]:
+            decision = reputation_verdict
+
+        # A forged From domain is never allowed through
+        if auth_result and auth_result["auth_verdict"] == "fail" and decision == "ALLOW":
+            decision = "WARN"
+
         explanation = []
 
         if detected_cues:
@@ -42,6 +65,18 @@ class DecisionEngine:
                 + ", ".join(behavioral_result["behavioral_flags"])
             )
 
+        if auth_result and auth_result["auth_flags"]:
+            explanation.append(
+                "Sender authentication failed: "
+                + ", ".join(auth_result["auth_flags"])
+            )
+
+        if reputation and reputation["flag_rate"] > 0:
+            explanation.append(
+                f"The sender domain {reputation['domain']} was recently flagged in "
+                f"{round(reputation['flag_rate'] * 100)}% of its messages."
+            )
+
         if decision == "ALLOW":
             explanation.append(
                 "No immediate high-risk phishing indicators were detected."
@@ -65,5 +100,6 @@ class DecisionEngine:
 
 _decision_engine = DecisionEngine()
 
-def run_decision_engine(nlp_result: dict, behavioral_result: dict) -> dict:
-    return _decision_engine.decide(nlp_result, behavioral_result)
+def run_decision_engine(nlp_result: dict, behavioral_result: dict,
+                        reputation: dict = None, auth_result: dict = None) -> dict:
+    return _decision_engine.decide(nlp_result, behavioral_result, reputation, auth_result)
@@ -3,40 +3,310 @@
 # Unified entry point for Email, Voice, and Chat analysis
 # ======================================================
 
-from eml_parser import parse_eml
-from nlp_engine import run_nlp
+from config import CASCADE_ENABLED, CASCADE_BENIGN_MAX, CASCADE_PHISHING_MIN, AUTH_SHORT_CIRCUIT
+from eml_parser import parse_eml_stream
+from nlp_engine import run_nlp_windows, score_cues
 from module2_behavioral import run_behavioral
+from auth_checks import run_auth_checks
 from module3_decision_engine import run_decision_engine
+from database import hash_email, extract_sender_domain
+from result_cache import get_result_cache, result_key
+from sender_reputation import lookup_reputation, observe_decision, applied_verdict, is_reputation_input
+from metrics import timer, count, collect_timings
+from text_builder import assemble_email_text, build_windows
 
 
 # ======================================================
 # EMAIL PIPELINE
 # ======================================================
 
-def run_module_3(eml_file_path: str) -> dict:
+def run_module_3(eml_source) -> dict:
     """
-    Full phishing detection pipeline for EMAIL input (.eml files)
+    Full phishing detection pipeline for EMAIL input: a .eml path,
+    raw message bytes or a binary file object
     """
 
-    # Parse email
-    headers, body = parse_eml(eml_file_path)
+    with collect_timings() as timings:
+        # Parse email (bounded, attachments skipped, HTML links collected)
+        result = run_module_3_parsed(parse_eml_stream(eml_source))
+        if timings is not None:
+            result["timings"] = timings.as_dict()
+    return result
 
-    # Build combined text for NLP
-    full_text = build_text_from_email(headers, body)
 
-    # Run NLP analysis
-    nlp_result = run_nlp(full_text)
+def run_module_3_parsed(parsed: dict) -> dict:
+    """
+    Pipeline for a message already parsed by parse_eml_stream()
+    """
+
+    headers, body = parsed["headers"], parsed["body"]
+
+    with collect_timings() as timings:
+        # Re-delivered / forwarded duplicates skip inference entirely,
+        # as long as they authenticate the same way
+        with timer("auth"):
+            auth_result = run_auth_checks(headers)
+        reputation = lookup_reputation(extract_sender_domain(headers))
+        result = get_result_cache().get(result_key(
+            hash_email(headers, body), auth_result, applied_verdict(reputation, auth_result)
+        ))
+        if result is None:
+            # Reuse the auth checks and reputation lookup made for the key
+            prepared = prepare_email(headers, body, parsed["links"], auth_result=auth_result)
+            result = analyze_prepared([prepared], check_cache=False, reputations=[reputation])[0]
+        if timings is not None:
+            result["timings"] = timings.as_dict()
+    return result
+
+
+def run_module_3_batch(messages: list) -> list:
+    """
+    Pipeline for many raw EML messages (bytes) held in memory. All
+    messages share one batched NLP call; a message that cannot be
+    parsed, or has no email headers, gets {"error": ...} in its slot
+    instead of a result.
+    """
+
+    results = [None] * len(messages)
+    prepared = []
+    positions = []
 
-    # Run behavioral analysis (email-specific)
-    behavioral_result = run_behavioral(headers, body)
+    for i, raw in enumerate(messages):
+        try:
+            parsed = parse_eml_stream(raw)
+        except Exception as e:
+            results[i] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+        if not has_email_headers(parsed["headers"]):
+            # Empty input or not an email at all; nothing to judge
+            results[i] = {"error": "no From, To or Subject header found"}
+            continue
+        prepared.append(prepare_email(parsed["headers"], parsed["body"], parsed["links"]))
+        positions.append(i)
 
-    # Final decision
-    decision = run_decision_engine(nlp_result, behavioral_result)
+    for i, item, result in zip(positions, prepared, analyze_prepared(prepared)):
+        results[i] = {"headers": item["headers"], "body": item["body"], **result}
+
+    return results
+
+
+def has_email_headers(headers: dict) -> bool:
+    # parse_eml_stream() stores absent headers as "None"
+    return any(headers.get(name, "None") not in ("None", "") for name in ("from", "to", "subject"))
+
+
+def prepare_email(headers: dict, body: str, links=None, auth_result=None) -> dict:
+    """
+    Model-free work for one parsed email: hashing, behavioral analysis,
+    the cheap rule stages over the full text and the token-budgeted
+    classifier windows. Safe to run in a worker process. Pass
+    auth_result when run_auth_checks() has already been run.
+    """
+
+    text, body_start = assemble_email_text(headers, body)
+    with timer("behavioral"):
+        behavioral_result = run_behavioral(headers, body, links)
+    rules = run_rule_stages(headers, text, behavioral_result, auth_result)
 
     return {
-        "nlp_analysis": nlp_result,
+        "headers": headers,
+        "body": body,
+        "email_hash": hash_email(headers, body),
+        "text": text,
+        "windows": build_windows(text, body_start, rules["cue_matches"]),
         "behavioral_analysis": behavioral_result,
-        "decision_engine": decision
+        "rules": rules
+    }
+
+
+def analyze_prepared(prepared: list, check_cache=True, reputations=None) -> list:
+    """
+    Finish a batch of prepare_email() outputs: cached results are
+    reused (check_cache=False when the caller has just looked), messages
+    the rule stages or a known-bad sender domain settle skip the
+    classifier, and the rest share one batched NLP call. `reputations`
+    are the senders' lookup_reputation() results, if already fetched.
+    """
+
+    domains = [extract_sender_domain(item["headers"]) for item in prepared]
+    if reputations is None:
+        reputations = [lookup_reputation(domain) for domain in domains]
+    verdicts = [
+        applied_verdict(reputation, item["rules"]["auth_analysis"])
+        for item, reputation in zip(prepared, reputations)
+    ]
+    keys = [
+        result_key(item["email_hash"], item["rules"]["auth_analysis"], verdict)
+        for item, verdict in zip(prepared, verdicts)
+    ]
+
+    cache = get_result_cache()
+    results = [cache.get(key) if check_cache else None for key in keys]
+
+    pending = [i for i, result in enumerate(results) if result is None]
+    nlp_results = {}
+
+    uncertain = []
+    verdict_stages = {}
+    for i in pending:
+        if verdicts[i]:
+            # Repeat campaign from a domain that is already being flagged
+            verdict, stage = "phishing", "reputation"
+        else:
+            verdict, stage = cascade_verdict(prepared[i]["rules"])
+        if verdict is None:
+            uncertain.append(i)
+            verdict_stages[i] = "classifier"
+        else:
+            nlp_results[i] = build_rule_nlp_result(prepared[i]["rules"], verdict, stage)
+            verdict_stages[i] = stage
+
+    if uncertain:
+        with timer("nlp"):
+            batch = run_nlp_windows(
+                [prepared[i]["text"] for i in uncertain],
+                [prepared[i]["windows"] for i in uncertain],
+                [rule_cue_result(prepared[i]["rules"]) for i in uncertain]
+            )
+        nlp_results.update(zip(uncertain, batch))
+    count("decepta_cascade_total", len(uncertain), classifier="ran")
+    count("decepta_cascade_total", len(pending) - len(uncertain), classifier="skipped")
+
+    for i in pending:
+        nlp_result = nlp_results[i]
+        rules = prepared[i]["rules"]
+        behavioral_result = prepared[i]["behavioral_analysis"]
+
+        reputation = reputations[i]
+
+        auth_result = rules["auth_analysis"]
+
+        # Final decision
+        with timer("decision"):
+            decision = run_decision_engine(nlp_result, behavioral_result, reputation, auth_result)
+        count("decepta_decisions_total", pipeline="email", decision=decision["decision"])
+        reputation_input = is_reputation_input(auth_result, verdicts[i] is not None)
+        if reputation_input:
+            observe_decision(domains[i], decision["decision"], decision["final_risk_score"])
+
+        result = {
+            "nlp_analysis": nlp_result,
+            "behavioral_analysis": behavioral_result,
+            "auth_analysis": auth_result,
+            "decision_engine": decision,
+            "sender_reputation": reputation,
+            "reputation_input": reputation_input,
+            "cascade": {
+                "stages": [stage for stage, _ in rules["stages"]]
+                          + (["reputation"] if reputation is not None else [])
+                          + (["classifier"] if i in uncertain else []),
+                "rule_score": rules["score"],
+                "verdict_stage": verdict_stages[i],
+                "classifier": "ran" if i in uncertain else "skipped"
+            }
+        }
+        cache.put(keys[i], result)
+        results[i] = result
+
+    return results
+
+
+# ======================================================
+# RULE STAGES (RUN BEFORE THE CLASSIFIER)
+# ======================================================
+
+def run_rule_stages(headers: dict, text: str, behavioral_result: dict, auth_result=None) -> dict:
+    """
+    Cheap header and regex stages, cheapest and strongest first. Each
+    contributes a score in [0, 1]; their capped sum is the rule
+    confidence the cascade acts on.
+    """
+
+    if auth_result is None:
+        with timer("auth"):
+            auth_result = run_auth_checks(headers)
+    with timer("cues"):
+        cues, cue_matches, cue_score = score_cues(text)
+
+    stages = [
+        ("authentication", auth_result["auth_risk_score"]),
+        ("cues", cue_score),
+        ("behavioral", behavioral_result.get("behavioral_score", 0.0))
+    ]
+
+    return {
+        "score": round(min(sum(score for _, score in stages), 1.0), 2),
+        "stages": stages,
+        "detected_cues": cues,
+        "cue_matches": cue_matches,
+        "cue_score": cue_score,
+        "auth_analysis": auth_result
+    }
+
+
+def rule_cue_result(rules: dict):
+    # The rule stages' cue scan, in the form score_cues() returns it
+    return rules["detected_cues"], rules["cue_matches"], rules["cue_score"]
+
+
+def cascade_verdict(rules: dict):
+    """
+    (verdict, stage): "benign" / "phishing" and the stage that settled
+    it ("authentication" or "rules") when the rule stages are
+    conclusive, (None, None) when the classifier has to decide
+    """
+
+    if not CASCADE_ENABLED:
+        return None, None
+    # A forged From domain needs no language model to be judged
+    if AUTH_SHORT_CIRCUIT and rules["auth_analysis"]["auth_verdict"] == "fail":
+        return "phishing", "authentication"
+
+    rule_score = rules["score"]
+    if rule_score <= CASCADE_BENIGN_MAX:
+        return "benign", "rules"
+    if rule_score >= CASCADE_PHISHING_MIN:
+        return "phishing", "rules"
+    return None, None
+
+
+# Rule stages whose scores run_decision_engine() weighs in on its own
+ENGINE_STAGES = ("authentication", "behavioral")
+
+# top_intent of the stand-in result, by the stage that settled the verdict
+RULE_INTENTS = {
+    "authentication": "forged sender domain",
+    "reputation": "known bad sender domain"
+}
+
+
+def build_rule_nlp_result(rules: dict, verdict: str, stage: str) -> dict:
+    """
+    Stand-in for the classifier output when an earlier stage was
+    conclusive. Like the classifier's, the score covers the cues only;
+    the decision engine adds behavioral, authentication and reputation
+    risk itself.
+    """
+
+    phishing_score = round(min(
+        sum(score for name, score in rules["stages"] if name not in ENGINE_STAGES), 1.0
+    ), 2)
+
+    if stage in RULE_INTENTS:
+        top_intent = RULE_INTENTS[stage]
+    else:
+        top_intent = "phishing attempt" if verdict == "phishing" else "legitimate email"
+
+    return {
+        "phishing_score": phishing_score,
+        "detected_cues": rules["detected_cues"],
+        "cue_matches": rules["cue_matches"],
+        "top_intent": top_intent,
+        "confidence": (
+            "high" if phishing_score > 0.75
+            else "medium" if phishing_score > 0.4
+            else "low"
+        )
     }
 
 
@@ -52,23 +322,34 @@ def run_module_3_from_text(text: str) -> dict:
     - Chat messages
     """
 
-    # Run NLP analysis
-    nlp_result = run_nlp(text)
+    with collect_timings() as timings:
+        # Run NLP analysis
+        with timer("cues"):
+            cue_result = score_cues(text)
+        with timer("nlp"):
+            nlp_result = run_nlp_windows(
+                [text], [build_windows(text, cue_matches=cue_result[1])], [cue_result]
+            )[0]
 
-    # Behavioral analysis is minimal for voice/chat
-    behavioral_result = {
-        "behavioral_flags": [],
-        "behavioral_score": 0.0
-    }
+        # Behavioral analysis is minimal for voice/chat
+        behavioral_result = {
+            "behavioral_flags": [],
+            "behavioral_score": 0.0
+        }
 
-    # Final decision
-    decision = run_decision_engine(nlp_result, behavioral_result)
+        # Final decision
+        with timer("decision"):
+            decision = run_decision_engine(nlp_result, behavioral_result)
+        count("decepta_decisions_total", pipeline="text", decision=decision["decision"])
 
-    return {
-        "nlp_analysis": nlp_result,
-        "behavioral_analysis": behavioral_result,
-        "decision_engine": decision
-    }
+        result = {
+            "nlp_analysis": nlp_result,
+            "behavioral_analysis": behavioral_result,
+            "decision_engine": decision
+        }
+        if timings is not None:
+            result["timings"] = timings.as_dict()
+    return result
 
 
 # ======================================================
@@ -78,19 +359,7 @@ def run_module_3_from_text(text: str) -> dict:
 def build_text_from_email(headers: dict, body: str) -> str:
     """
     Combine important email fields into a single text blob
-    for NLP analysis
+    for the rule stages (the classifier gets build_windows() of it)
     """
 
-    subject = headers.get("subject", "")
-    sender = headers.get("from", "")
-    receiver = headers.get("to", "")
-
-    combined_text = f"""
-From: {sender}
-To: {receiver}
-Subject: {subject}
-
-{body}
-"""
-
-    return combined_text.strip()
+    return assemble_email_text(headers, body)[0]
@@ -1,92 +1,286 @@
-from transformers import pipeline
-import re
+import os
+
+from config import (
+    NLP_BATCH_SIZE,
+    NLP_MAX_BATCH_TOKENS,
+    NLP_MODEL_NAME,
+    NLP_BACKEND,
+    NLP_ONNX_DIR,
+    NLP_STUDENT_DIR
+)
+from model_registry import register_model, get_model
+from cue_engine import extract_cues, scan_cues
+from text_builder import build_email_text
+from metrics import metrics_enabled, observe, count
+
+BACKENDS = ("torch", "torch-int8", "onnx", "student")
+
+# Zero-shot hypotheses, also the student's output classes
+LABELS = [
+    "phishing attempt",
+    "credential harvesting",
+    "urgent request",
+    "authority impersonation",
+    "legitimate email"
+]
+
+CUE_WEIGHT = 0.15
+MAX_CUE_SCORE = 0.6
+
+
+def score_cues(text: str):
+    """
+    Model-free part of the NLP score: (cues, cue_matches, cue_score)
+    """
+
+    # Categories from the token set; offsets only when it found a cue
+    cues, cue_matches = scan_cues(text)
+    return cues, cue_matches, min(len(cues) * CUE_WEIGHT, MAX_CUE_SCORE)
+
+
+def phishing_base_score(scores: dict) -> float:
+    """
+    Classifier part of the NLP score: the strongest phishing label
+    """
+
+    return max(
+        scores.get("phishing attempt", 0),
+        scores.get("credential harvesting", 0),
+        scores.get("authority impersonation", 0)
+    )
+
 
 class PhishingNLPModule:
-    def __init__(self):
-        self.classifier = pipeline(
-            "zero-shot-classification",
-            model="valhalla/distilbart-mnli-12-1"
-        )
+    def __init__(self, batch_size=NLP_BATCH_SIZE, max_batch_tokens=NLP_MAX_BATCH_TOKENS,
+                 backend=NLP_BACKEND):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown NLP backend: {backend} (expected one of {BACKENDS})")
 
-        self.labels = [
-            "phishing attempt",
-            "credential harvesting",
-            "urgent request",
-            "authority impersonation",
-            "legitimate email"
-        ]
+        self.backend = backend
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
 
-        self.urgency_words = [
-            "urgent", "immediately", "within", "suspended",
-            "locked", "expire", "final warning", "action required"
-        ]
+        self.labels = list(LABELS)
 
-        self.credential_patterns = [
-            r"password", r"otp", r"verification code",
-            r"login", r"credentials", r"pin"
-        ]
+        self.student = None
+        if backend == "student":
+            # Distilled by distill.py: one forward pass per text, no
+            # hypotheses and no teacher weights loaded
+            from student_model import StudentClassifier
+            self.student = StudentClassifier(NLP_STUDENT_DIR, batch_size)
+            if self.student.labels != self.labels:
+                raise ValueError(f"Student in {NLP_STUDENT_DIR} was trained on different labels")
+            return
 
-    def extract_linguistic_cues(self, text: str):
-        cues = set()
-        lower = text.lower()
+        # Heavy imports stay out of module import so the web app starts fast
+        from transformers import AutoTokenizer
 
-        for word in self.urgency_words:
-            if word in lower:
-                cues.add("urgency")
+        self.tokenizer = AutoTokenizer.from_pretrained(NLP_MODEL_NAME)
+        self.model = self._load_model(backend)
 
-        for pattern in self.credential_patterns:
-            if re.search(pattern, lower):
-                cues.add("credential_request")
+        # Same hypothesis and entailment index the zero-shot pipeline uses
+        self.hypothesis_template = "This example is {}."
+        self.entailment_id = self._find_entailment_id()
 
-        if re.search(r"admin|support|security team|bank|it desk", lower):
-            cues.add("authority_impersonation")
+    def _load_model(self, backend):
+        if backend == "onnx":
+            try:
+                from optimum.onnxruntime import ORTModelForSequenceClassification
+            except ImportError:
+                raise ImportError(
+                    "The onnx backend needs optimum[onnxruntime] installed"
+                )
 
-        if re.search(r"click|verify|confirm|update|reset", lower):
-            cues.add("action_request")
+            # Export once, then reuse the saved graph
+            if os.path.isdir(NLP_ONNX_DIR):
+                return ORTModelForSequenceClassification.from_pretrained(NLP_ONNX_DIR)
+            model = ORTModelForSequenceClassification.from_pretrained(
+                NLP_MODEL_NAME, export=True
+            )
+            model.save_pretrained(NLP_ONNX_DIR)
+            return model
 
-        return list(cues)
+        import torch
+        from transformers import AutoModelForSequenceClassification
 
-    def analyze_text(self, text: str) -> dict:
+        model = AutoModelForSequenceClassification.from_pretrained(NLP_MODEL_NAME)
+        model.eval()
+
+        if backend == "torch-int8":
+            # Linear layers hold nearly all of BART's weights and FLOPs
+            model = torch.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+
+        return model
+
+    def _find_entailment_id(self):
+        for label, index in self.model.config.label2id.items():
+            if label.lower().startswith("entail"):
+                return index
+        return -1
+
+    def extract_linguistic_cues(self, text: str):
+        return extract_cues(text)
+
+    def classify_batch(self, texts: list) -> list:
         """
-        Generic NLP analysis for ANY text input
-        (email body, voice transcript, chat message)
+        Zero-shot scores for many texts at once.
+        Every (text, label) pair is tokenized once, sorted by length
+        and packed into padded micro-batches bounded by batch_size
+        and max_batch_tokens, so similar lengths share a forward pass.
+        Returns one {label: score} dict per text.
         """
 
-        classification = self.classifier(text, self.labels)
-        scores = dict(zip(classification["labels"], classification["scores"]))
+        if self.student is not None:
+            return self.student.predict(texts)
+
+        import torch
+
+        if not texts:
+            return []
 
-        base_score = max(
-            scores.get("phishing attempt", 0),
-            scores.get("credential harvesting", 0),
-            scores.get("authority impersonation", 0)
+        hypotheses = [self.hypothesis_template.format(label) for label in self.labels]
+        premises = [text for text in texts for _ in self.labels]
+        pair_hypotheses = hypotheses * len(texts)
+
+        encoded = self.tokenizer(
+            premises,
+            pair_hypotheses,
+            truncation="only_first",
+            max_length=self.tokenizer.model_max_length
         )
+        input_ids = encoded["input_ids"]
+        attention_mask = encoded["attention_mask"]
+
+        if metrics_enabled():
+            # One pair per text: the premise is the same for every label
+            limit = self.tokenizer.model_max_length
+            for i in range(0, len(input_ids), len(self.labels)):
+                observe("decepta_classifier_input_tokens", len(input_ids[i]))
+                if len(input_ids[i]) >= limit:
+                    count("decepta_classifier_truncated_total")
+
+        order = sorted(range(len(input_ids)), key=lambda i: len(input_ids[i]), reverse=True)
+        entail_logits = [0.0] * len(input_ids)
 
-        cues = self.extract_linguistic_cues(text)
+        with torch.inference_mode():
+            for batch in self._micro_batches(order, input_ids):
+                padded = self.tokenizer.pad(
+                    {
+                        "input_ids": [input_ids[i] for i in batch],
+                        "attention_mask": [attention_mask[i] for i in batch]
+                    },
+                    return_tensors="pt"
+                )
+                logits = self.model(**padded).logits
+                for i, value in zip(batch, logits[:, self.entailment_id].tolist()):
+                    entail_logits[i] = value
 
-        cue_weight = 0.15
-        cue_score = min(len(cues) * cue_weight, 0.6)
+        n_labels = len(self.labels)
+        results = []
+        for t in range(len(texts)):
+            row = torch.tensor(entail_logits[t * n_labels:(t + 1) * n_labels])
+            probs = row.softmax(dim=0).tolist()
+            results.append(dict(zip(self.labels, probs)))
+
+        return results
+
+    def _micro_batches(self, order, input_ids):
+        # order is longest-first, so the first row of a batch sets its padded width
+        batch = []
+        width = 0
+        for i in order:
+            length = len(input_ids[i])
+            new_width = max(width, length)
+            if batch and (
+                len(batch) >= self.batch_size
+                or new_width * (len(batch) + 1) > self.max_batch_tokens
+            ):
+                yield batch
+                batch = []
+                new_width = length
+            batch.append(i)
+            width = new_width
+        if batch:
+            yield batch
+
+    def build_result(self, text: str, scores: dict, cue_result=None) -> dict:
+        """
+        Turn raw label scores into the phishing result dict. cue_result
+        is score_cues(text) when the caller already has it.
+        """
+
+        ranked = sorted(scores, key=scores.get, reverse=True)
+
+        base_score = phishing_base_score(scores)
+
+        cues, cue_matches, cue_score = cue_result or score_cues(text)
 
         phishing_score = min(base_score + cue_score, 1.0)
 
         return {
             "phishing_score": round(phishing_score, 2),
             "detected_cues": cues,
-            "top_intent": classification["labels"][0],
+            "cue_matches": cue_matches,
+            "top_intent": ranked[0],
             "confidence": (
                 "high" if phishing_score > 0.75
                 else "medium" if phishing_score > 0.4
                 else "low"
             )
         }
-    def analyze_email(self, headers: dict, body: str) -> dict:
-        combined_text = f"""
-        From: {headers.get('from', '')}
-        Subject: {headers.get('subject', '')}
 
-        {body}
+    def analyze_batch(self, texts: list) -> list:
+        """
+        Batched NLP analysis, one result per input text
         """
-        return self.analyze_text(combined_text)
-_nlp_engine = PhishingNLPModule()
+
+        scores = self.classify_batch(texts)
+        return [self.build_result(text, s) for text, s in zip(texts, scores)]
+
+    def analyze_windows(self, texts: list, windows: list, cue_results=None) -> list:
+        """
+        Batched analysis of texts cut into text_builder windows: every
+        window of every text shares one classify_batch() call, each text
+        takes the scores of its most suspicious window, and cues are
+        scored on the full text (or taken from cue_results, one
+        score_cues() tuple per text, when the rule stages already did)
+        """
+
+        flat = [window for text_windows in windows for window in text_windows]
+        scores = iter(self.classify_batch(flat))
+
+        results = []
+        for i, (text, text_windows) in enumerate(zip(texts, windows)):
+            best = max(
+                (next(scores) for _ in text_windows),
+                key=phishing_base_score
+            )
+            results.append(self.build_result(text, best, cue_results[i] if cue_results else None))
+        return results
+
+    def analyze_text(self, text: str) -> dict:
+        """
+        Generic NLP analysis for ANY text input
+        (email body, voice transcript, chat message)
+        """
+
+        return self.analyze_batch([text])[0]
+
+    def analyze_email(self, headers: dict, body: str) -> dict:
+        text, windows = build_email_text(headers, body)
+        return self.analyze_windows([text], [windows])[0]
+register_model("nlp", PhishingNLPModule)
+
+def get_nlp_engine() -> PhishingNLPModule:
+    return get_model("nlp")
 
 def run_nlp(text: str) -> dict:
-    return _nlp_engine.analyze_text(text)
+    return get_nlp_engine().analyze_text(text)
+
+def run_nlp_batch(texts: list) -> list:
+    return get_nlp_engine().analyze_batch(texts)
+
+def run_nlp_windows(texts: list, windows: list, cue_results=None) -> list:
+    return get_nlp_engine().analyze_windows(texts, windows, cue_results)
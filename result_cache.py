@@ -0,0 +1,111 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from analysis_writer import get_analysis_writer
+from config import (
+    MODEL_VERSION,
+    RESULT_CACHE_SIZE,
+    RESULT_CACHE_TTL_SECONDS,
+    RESULT_CACHE_PRUNE_SECONDS
+)
+from database import migrate, load_cached_result
+from metrics import count
+
+
+def result_key(email_hash, auth_result, reputation_verdict=None):
+    """
+    Cache key for one analysis: hash_email() plus the inputs outside the
+    hashed fields that the decision depends on, i.e. the normalized
+    SPF / DKIM / DMARC results and the reputation verdict applied
+    """
+
+    auth = auth_result["auth_results"]
+    material = "|".join((
+        email_hash, auth["spf"], auth["dkim"], auth["dmarc"], reputation_verdict or ""
+    ))
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier cache of full analysis results keyed on result_key().
+    Tier 1 is an in-process LRU, tier 2 is the result_cache table.
+    Entries expire after ttl_seconds and are ignored when their
+    model_version tag differs from the running one. Table writes go
+    through the analysis writer, which also deletes rows that can no
+    longer be read every prune_seconds.
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_SIZE,
+                 ttl_seconds=RESULT_CACHE_TTL_SECONDS,
+                 model_version=MODEL_VERSION,
+                 prune_seconds=RESULT_CACHE_PRUNE_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.model_version = model_version
+        self.prune_seconds = prune_seconds
+        self._pruned_at = None
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Not every process migrates on startup; the table layout has
+        # changed across versions
+        migrate()
+
+    def get(self, key):
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created_at, result = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    count("decepta_result_cache_lookups_total", outcome="memory_hit")
+                    return copy.deepcopy(result)
+                del self._entries[key]
+
+        row = load_cached_result(
+            key, self.model_version, now - self.ttl_seconds
+        )
+        if row is None:
+            count("decepta_result_cache_lookups_total", outcome="miss")
+            return None
+
+        count("decepta_result_cache_lookups_total", outcome="db_hit")
+        result, created_at = row
+        self._remember(key, result, created_at)
+        return copy.deepcopy(result)
+
+    def put(self, key, result):
+        created_at = time.time()
+        result = copy.deepcopy(result)
+
+        self._remember(key, result, created_at)
+        writer = get_analysis_writer()
+        writer.submit_cached(key, self.model_version, result, created_at)
+
+        if self._pruned_at is None or created_at - self._pruned_at >= self.prune_seconds:
+            self._pruned_at = created_at
+            writer.prune_cached(created_at - self.ttl_seconds, self.model_version)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key, result, created_at):
+        with self._lock:
+            self._entries[key] = (created_at, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_result_cache = ResultCache()
+
+def get_result_cache() -> ResultCache:
+    return _result_cache
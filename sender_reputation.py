@@ -0,0 +1,220 @@
+# ======================================================
+# SENDER REPUTATION
+# Decayed per-domain decision history for the decision engine
+# ======================================================
+
+import calendar
+import sqlite3
+import threading
+import time
+
+from config import (
+    REPUTATION_ENABLED,
+    REPUTATION_WINDOW_HOURS,
+    REPUTATION_HALF_LIFE_HOURS,
+    REPUTATION_REFRESH_SECONDS,
+    REPUTATION_MIN_MESSAGES,
+    REPUTATION_BAD_MIN_MESSAGES,
+    REPUTATION_BAD_BLOCK_RATE,
+    REPUTATION_BAD_FLAG_RATE,
+    REPUTATION_SHARED_DOMAINS
+)
+from database import domain_rollups_since
+
+
+class _DomainStats:
+    """
+    Exponentially decayed message / flagged / blocked counts and risk
+    sum, all as of `as_of` (epoch seconds)
+    """
+
+    __slots__ = ("messages", "flagged", "blocked", "risk_sum", "as_of")
+
+    def __init__(self, as_of):
+        self.messages = self.flagged = self.blocked = self.risk_sum = 0.0
+        self.as_of = as_of
+
+    def decay_to(self, now, half_life):
+        if now > self.as_of:
+            factor = 0.5 ** ((now - self.as_of) / half_life)
+            self.messages *= factor
+            self.flagged *= factor
+            self.blocked *= factor
+            self.risk_sum *= factor
+            self.as_of = now
+
+    def add(self, messages, flagged, blocked, risk_sum, weight=1.0):
+        self.messages += messages * weight
+        self.flagged += flagged * weight
+        self.blocked += blocked * weight
+        self.risk_sum += risk_sum * weight
+
+
+class SenderReputation:
+    """
+    Rebuilt from the hourly rollup_reputation table every refresh_seconds
+    (older hours weigh less, halving every half_life_hours). Decisions
+    made in this process in between are added by observe(), so a
+    campaign is recognised without waiting for the next refresh.
+    Only decisions that pass is_reputation_input() are learned from.
+    """
+
+    def __init__(self, enabled=REPUTATION_ENABLED,
+                 window_hours=REPUTATION_WINDOW_HOURS,
+                 half_life_hours=REPUTATION_HALF_LIFE_HOURS,
+                 refresh_seconds=REPUTATION_REFRESH_SECONDS,
+                 min_messages=REPUTATION_MIN_MESSAGES,
+                 bad_min_messages=REPUTATION_BAD_MIN_MESSAGES,
+                 bad_block_rate=REPUTATION_BAD_BLOCK_RATE,
+                 bad_flag_rate=REPUTATION_BAD_FLAG_RATE,
+                 shared_domains=REPUTATION_SHARED_DOMAINS):
+        self.enabled = enabled
+        self.window_hours = window_hours
+        self.half_life = half_life_hours * 3600
+        self.refresh_seconds = refresh_seconds
+        self.min_messages = min_messages
+        self.bad_min_messages = bad_min_messages
+        self.bad_block_rate = bad_block_rate
+        self.bad_flag_rate = bad_flag_rate
+        self.shared_domains = shared_domains
+
+        self._domains = {}
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def lookup(self, domain):
+        """
+        {domain, messages, flag_rate, block_rate, mean_risk, risk, verdict}
+        for a domain with enough history, else None. verdict is "BLOCK"
+        or "WARN" when the history alone settles the decision.
+        """
+
+        if not self._tracked(domain):
+            return None
+        self._maybe_refresh()
+
+        now = time.time()
+        with self._lock:
+            stats = self._domains.get(domain)
+            if stats is None:
+                return None
+            stats.decay_to(now, self.half_life)
+            if stats.messages < self.min_messages:
+                return None
+
+            block_rate = stats.blocked / stats.messages
+            flag_rate = stats.flagged / stats.messages
+
+            verdict = None
+            if stats.messages >= self.bad_min_messages:
+                if block_rate >= self.bad_block_rate:
+                    verdict = "BLOCK"
+                elif flag_rate >= self.bad_flag_rate:
+                    verdict = "WARN"
+
+            return {
+                "domain": domain,
+                "messages": round(stats.messages, 1),
+                "flag_rate": round(flag_rate, 3),
+                "block_rate": round(block_rate, 3),
+                "mean_risk": round(stats.risk_sum / stats.messages, 3),
+                # BLOCKs count fully, other flagged decisions half
+                "risk": round((block_rate + flag_rate) / 2, 3),
+                "verdict": verdict
+            }
+
+    def observe(self, domain, decision, risk_score):
+        if not self._tracked(domain):
+            return
+
+        now = time.time()
+        with self._lock:
+            stats = self._domains.get(domain)
+            if stats is None:
+                stats = self._domains[domain] = _DomainStats(now)
+            stats.decay_to(now, self.half_life)
+            stats.add(1, decision != "ALLOW", decision == "BLOCK", risk_score)
+
+    def refresh(self):
+        now = time.time()
+        since = time.strftime(
+            "%Y-%m-%dT%H", time.gmtime(now - self.window_hours * 3600)
+        )
+
+        domains = {}
+        for bucket, domain, messages, flagged, blocked, risk_sum in domain_rollups_since(since):
+            if not self._tracked(domain):
+                continue
+            # Weight each hour by the age of its midpoint
+            bucket_time = calendar.timegm(time.strptime(bucket, "%Y-%m-%dT%H")) + 1800
+            weight = 0.5 ** (max(now - bucket_time, 0) / self.half_life)
+
+            stats = domains.get(domain)
+            if stats is None:
+                stats = domains[domain] = _DomainStats(now)
+            stats.add(messages, flagged, blocked, risk_sum or 0.0, weight)
+
+        with self._lock:
+            self._domains = domains
+            self._refreshed_at = now
+
+    def _maybe_refresh(self):
+        if self._refreshed_at is not None and time.time() - self._refreshed_at < self.refresh_seconds:
+            return
+        # One thread refreshes; the rest keep using the current table
+        if not self._refresh_lock.acquire(blocking=self._refreshed_at is None):
+            return
+        try:
+            if self._refreshed_at is None or time.time() - self._refreshed_at >= self.refresh_seconds:
+                try:
+                    self.refresh()
+                except sqlite3.Error as e:
+                    # Keep the current table; retry after the next interval
+                    print(f"[WARN] Sender reputation refresh failed: {e}")
+                    self._refreshed_at = time.time()
+        finally:
+            self._refresh_lock.release()
+
+    def _tracked(self, domain):
+        return (
+            self.enabled
+            and domain
+            and domain != "unknown"
+            and domain not in self.shared_domains
+        )
+
+
+def applied_verdict(reputation, auth_result):
+    """
+    The decision a sender's history imposes on one message: None when
+    there is none, or when the message authenticated as its From domain
+    (DMARC pass), since spoofed mail may have earned the history
+    """
+
+    if not reputation or not reputation["verdict"]:
+        return None
+    if auth_result and auth_result["auth_verdict"] == "pass":
+        return None
+    return reputation["verdict"]
+
+
+def is_reputation_input(auth_result, verdict_applied):
+    """
+    Whether a decision may feed back into its domain's reputation: not
+    when the reputation made it, nor when the From domain was forged
+    """
+
+    return not verdict_applied and not (auth_result and auth_result["auth_verdict"] == "fail")
+
+
+_sender_reputation = SenderReputation()
+
+def get_sender_reputation() -> SenderReputation:
+    return _sender_reputation
+
+def lookup_reputation(domain):
+    return _sender_reputation.lookup(domain)
+
+def observe_decision(domain, decision, risk_score):
+    _sender_reputation.observe(domain, decision, risk_score)
@@ -0,0 +1,91 @@
+# ======================================================
+# STUDENT MODEL
+# Single-pass phishing classifier distilled from the zero-shot teacher
+# ======================================================
+
+import json
+import os
+
+STUDENT_CONFIG = "student.json"
+
+# "head": frozen encoder, mean-pooled, plus a trained linear layer
+# "finetune": the whole encoder fine-tuned as a sequence classifier
+STUDENT_MODES = ("head", "finetune")
+
+
+def mean_pool(hidden, attention_mask):
+    mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+    return (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1.0)
+
+
+class StudentClassifier:
+    """
+    Loads a student saved by distill.py from a local directory and
+    scores texts in one forward pass each, returning the same
+    {label: probability} dicts as PhishingNLPModule.classify_batch()
+    """
+
+    def __init__(self, path, batch_size=16):
+        import torch
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(path, STUDENT_CONFIG)) as f:
+            self.config = json.load(f)
+
+        self.mode = self.config["mode"]
+        if self.mode not in STUDENT_MODES:
+            raise ValueError(f"Unknown student mode: {self.mode}")
+
+        self.labels = self.config["labels"]
+        self.max_length = self.config["max_length"]
+        self.batch_size = batch_size
+
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+
+        if self.mode == "head":
+            from transformers import AutoModel
+            self.encoder = AutoModel.from_pretrained(os.path.join(path, "encoder"))
+            self.head = torch.nn.Linear(self.encoder.config.hidden_size, len(self.labels))
+            self.head.load_state_dict(torch.load(os.path.join(path, "head.pt"), map_location="cpu"))
+            self.head.eval()
+        else:
+            from transformers import AutoModelForSequenceClassification
+            self.encoder = AutoModelForSequenceClassification.from_pretrained(path)
+        self.encoder.eval()
+
+    def logits(self, texts):
+        """
+        Raw label logits, one row per text, in input order
+        """
+
+        import torch
+
+        # Similar lengths share a batch, so little padding is wasted
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        rows = [None] * len(texts)
+
+        with torch.inference_mode():
+            for start in range(0, len(order), self.batch_size):
+                batch = order[start:start + self.batch_size]
+                encoded = self.tokenizer(
+                    [texts[i] for i in batch],
+                    truncation=True,
+                    max_length=self.max_length,
+                    padding=True,
+                    return_tensors="pt"
+                )
+                if self.mode == "head":
+                    hidden = self.encoder(**encoded).last_hidden_state
+                    logits = self.head(mean_pool(hidden, encoded["attention_mask"]))
+                else:
+                    logits = self.encoder(**encoded).logits
+                for i, row in zip(batch, logits):
+                    rows[i] = row
+
+        return torch.stack(rows) if rows else torch.empty(0, len(self.labels))
+
+    def predict(self, texts: list) -> list:
+        if not texts:
+            return []
+        probs = self.logits(texts).softmax(dim=-1).tolist()
+        return [dict(zip(self.labels, row)) for row in probs]
@@ -0,0 +1,176 @@
+# ======================================================
+# TEXT BUILDER
+# Token-budgeted classifier input for emails and transcripts
+# ======================================================
+
+import re
+from bisect import bisect_right
+
+from config import TEXT_WINDOW_TOKENS, TEXT_MAX_WINDOWS
+from cue_engine import find_cues
+
+# BPE averages ~4 characters per token on English prose; assume fewer
+# so windows stay under budget on URLs and unusual words
+CHARS_PER_TOKEN = 3.5
+
+# Share of a window reserved for the opening and the closing of the body
+OPENING_SHARE = 0.3
+CLOSING_SHARE = 0.15
+
+# Marks text left out between kept sentences
+GAP = "..."
+
+# A sentence runs to terminal punctuation followed by whitespace, or to
+# the end of its line, so URLs and decimals are not split
+_SENTENCE = re.compile(r"\S.*?(?:[.!?]+(?=\s|$)|$)", re.MULTILINE)
+_LINK = re.compile(r"https?://|www\.", re.IGNORECASE)
+
+
+def estimate_tokens(text: str) -> int:
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def assemble_email_text(headers: dict, body: str):
+    """
+    (text, body_start): From / To / Subject followed by the full body,
+    the form the rule stages scan, and where the body starts in it
+    """
+
+    header = (
+        f"From: {headers.get('from', '')}\n"
+        f"To: {headers.get('to', '')}\n"
+        f"Subject: {headers.get('subject', '')}"
+    )
+    body = body.rstrip()
+    if not body:
+        return header, len(header)
+    return f"{header}\n\n{body}", len(header) + 2
+
+
+def build_windows(text: str, body_start=0, cue_matches=None,
+                  budget=TEXT_WINDOW_TOKENS, max_windows=TEXT_MAX_WINDOWS) -> list:
+    """
+    Classifier inputs for `text`, each within `budget` estimated tokens.
+    Text that fits is returned whole. Otherwise the first window keeps
+    the header (text[:body_start]), the opening and closing of the body,
+    sentences with cues or links, then whatever else fits, in their
+    original order. Cue / link sentences that still do not fit go to
+    up to max_windows - 1 further windows. cue_matches are find_cues()
+    offsets into `text`, computed here when not given.
+    """
+
+    if estimate_tokens(text) <= budget:
+        return [text]
+
+    # A header alone never takes more than half a window
+    header = text[:body_start].strip()[:int(budget * CHARS_PER_TOKEN / 2)]
+    # Two tokens for the blank line after the header
+    body_budget = budget - (estimate_tokens(header) + 2 if header else 0)
+
+    spans = _sentence_spans(text, body_start, body_budget)
+    if not spans:
+        return [header]
+
+    sentences = [text[start:end] for start, end in spans]
+    # Plus one for the space or gap marker in front of each sentence
+    costs = [estimate_tokens(s) + 1 for s in sentences]
+
+    if cue_matches is None:
+        cue_matches = find_cues(text)
+    starts = [start for start, _ in spans]
+    cue_sentences = {
+        bisect_right(starts, match["start"]) - 1
+        for match in cue_matches if match["start"] >= body_start
+    }
+    priority = sorted(cue_sentences) + [
+        i for i, s in enumerate(sentences)
+        if i not in cue_sentences and _LINK.search(s)
+    ]
+
+    chosen = set()
+    used = 0
+
+    def take(i, limit):
+        nonlocal used
+        if i in chosen or used + costs[i] > limit:
+            return False
+        chosen.add(i)
+        used += costs[i]
+        return True
+
+    # Opening, then closing, each within its share
+    for i in range(len(sentences)):
+        if not take(i, body_budget * OPENING_SHARE):
+            break
+    closing_limit = used + body_budget * CLOSING_SHARE
+    for i in reversed(range(len(sentences))):
+        if i in chosen or not take(i, closing_limit):
+            break
+
+    overflow = [i for i in priority if i not in chosen and not take(i, body_budget)]
+    for i in range(len(sentences)):
+        take(i, body_budget)
+
+    windows = [_render(header, sentences, sorted(chosen))]
+
+    # A payload spread further than one window gets a few more
+    extra, used_extra = [], 0
+    for i in overflow:
+        if len(windows) >= max_windows:
+            break
+        if extra and used_extra + costs[i] > body_budget:
+            windows.append(_render(header, sentences, extra))
+            extra, used_extra = [], 0
+            if len(windows) >= max_windows:
+                break
+        extra.append(i)
+        used_extra += costs[i]
+    if extra and len(windows) < max_windows:
+        windows.append(_render(header, sentences, extra))
+
+    return windows
+
+
+def build_email_text(headers: dict, body: str, cue_matches=None):
+    """
+    (text, windows) for an email: the full text for the rule stages
+    and the budgeted windows for the classifier
+    """
+
+    text, body_start = assemble_email_text(headers, body)
+    return text, build_windows(text, body_start, cue_matches)
+
+
+def _sentence_spans(text, body_start, body_budget):
+    # No single run-on "sentence" may take more than a quarter window
+    max_chars = max(int(body_budget * CHARS_PER_TOKEN / 4), 1)
+
+    spans = []
+    for match in _SENTENCE.finditer(text, body_start):
+        start, end = match.span()
+        while end - start > max_chars:
+            cut = text.rfind(" ", start + 1, start + max_chars)
+            if cut == -1:
+                cut = start + max_chars
+            spans.append((start, cut))
+            start = cut + 1 if text[cut] == " " else cut
+        if start < end:
+            spans.append((start, end))
+    return spans
+
+
+def _render(header, sentences, indices):
+    parts = [header] if header else []
+    body = []
+    previous = None
+    for i in indices:
+        if body and i != previous + 1:
+            body.append(GAP)
+        body.append(sentences[i])
+        previous = i
+    if indices and indices[0] != 0:
+        body.insert(0, GAP)
+    if indices and indices[-1] != len(sentences) - 1:
+        body.append(GAP)
+    parts.append(" ".join(body))
+    return "\n\n".join(parts)
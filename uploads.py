@@ -0,0 +1,43 @@
+# ======================================================
+# UPLOADS
+# Keep uploaded files in memory, spooling only large ones
+# ======================================================
+
+import os
+import shutil
+import tempfile
+
+from config import UPLOAD_SPOOL_BYTES, UPLOAD_SPOOL_DIR
+
+
+def receive_upload(file, spool_bytes=UPLOAD_SPOOL_BYTES):
+    """
+    Take an uploaded file off the request: its bytes if it fits in
+    spool_bytes, otherwise the path of a unique temp file holding it.
+    Either form is accepted by the email and voice pipelines; pass it
+    to discard_upload() when done.
+    """
+
+    stream = getattr(file, "stream", file)
+    data = stream.read(spool_bytes + 1)
+    if len(data) <= spool_bytes:
+        return data
+
+    suffix = os.path.splitext(os.path.basename(getattr(file, "filename", "") or ""))[1]
+    fd, path = tempfile.mkstemp(prefix="decepta-", suffix=suffix, dir=UPLOAD_SPOOL_DIR)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(data)
+            shutil.copyfileobj(stream, out)
+    except BaseException:
+        discard_upload(path)
+        raise
+    return path
+
+
+def discard_upload(upload):
+    if isinstance(upload, str):
+        try:
+            os.remove(upload)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,202 @@
+# ======================================================
+# VOICE ACTIVITY DETECTION
+# Energy + zero-crossing-rate VAD in front of Whisper
+# ======================================================
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+
+# Frames quieter than this RMS are never speech
+ENERGY_FLOOR = 0.005
+
+# Speech must be this many times louder than the estimated noise floor,
+# capped so a block with no pauses does not raise the bar above speech
+ENERGY_RATIO = 3.0
+ENERGY_CEILING = 0.03
+
+# Fraction of sign changes per sample above which a quiet frame is
+# treated as noise (hiss, fans) rather than voiced speech
+ZCR_MAX = 0.35
+
+MIN_SPEECH_MS = 250
+MIN_SILENCE_MS = 400
+PAD_MS = 150
+MAX_SEGMENT_SECONDS = 28
+
+
+def frame_features(audio, sample_rate=SAMPLE_RATE, frame_ms=FRAME_MS):
+    """
+    Per-frame RMS energy and zero-crossing rate, computed over
+    non-overlapping frames in one vectorized pass
+    """
+
+    frame_len = int(sample_rate * frame_ms / 1000)
+    n_frames = len(audio) // frame_len
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+
+    frames = np.asarray(audio[:n_frames * frame_len], dtype=np.float32)
+    frames = frames.reshape(n_frames, frame_len)
+
+    energy = np.sqrt(np.mean(frames * frames, axis=1))
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frame_len
+
+    return energy, zcr
+
+
+def speech_mask(energy, zcr):
+    """
+    Boolean voiced/unvoiced decision per frame
+    """
+
+    if len(energy) == 0:
+        return np.zeros(0, dtype=bool)
+
+    noise_floor = np.percentile(energy, 10)
+    threshold = max(ENERGY_FLOOR, min(noise_floor * ENERGY_RATIO, ENERGY_CEILING))
+
+    loud = energy > threshold
+    # High ZCR is fine for loud frames (fricatives), not for quiet ones
+    return loud & ((zcr < ZCR_MAX) | (energy > threshold * 2))
+
+
+def detect_speech_segments(audio, sample_rate=SAMPLE_RATE,
+                           frame_ms=FRAME_MS,
+                           min_speech_ms=MIN_SPEECH_MS,
+                           min_silence_ms=MIN_SILENCE_MS,
+                           pad_ms=PAD_MS,
+                           max_segment_seconds=MAX_SEGMENT_SECONDS):
+    """
+    Return [(start_sample, end_sample), ...] spans of speech.
+    Gaps shorter than min_silence_ms are merged, bursts shorter
+    than min_speech_ms are dropped, and spans longer than
+    max_segment_seconds are split at their quietest frame.
+    """
+
+    energy, zcr = frame_features(audio, sample_rate, frame_ms)
+    mask = speech_mask(energy, zcr)
+    if not mask.any():
+        return []
+
+    # Run boundaries from the edges of the 0/1 mask
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    min_gap = max(1, min_silence_ms // frame_ms)
+    min_len = max(1, min_speech_ms // frame_ms)
+    max_len = int(max_segment_seconds * 1000 // frame_ms)
+    pad = pad_ms // frame_ms
+
+    merged = []
+    for start, end in zip(starts, ends):
+        if merged and start - merged[-1][1] < min_gap:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    # Padding only applies at real pauses, not where a long span was cut
+    segments = []
+    for start, end in merged:
+        if end - start < min_len:
+            continue
+        lead = pad
+        while end - start > max_len:
+            window = energy[start + max_len // 2:start + max_len]
+            cut = start + max_len // 2 + int(np.argmin(window))
+            segments.append((start - lead, cut))
+            start = cut
+            lead = 0
+        segments.append((start - lead, end + pad))
+
+    frame_len = int(sample_rate * frame_ms / 1000)
+    total = len(audio)
+    return [
+        (max(0, start * frame_len), min(total, end * frame_len))
+        for start, end in segments
+    ]
+
+
+def collect_voiced_audio(audio, sample_rate=SAMPLE_RATE, gap_ms=100):
+    """
+    Concatenate only the voiced spans of `audio`, separated by short
+    silences. Returns an empty array when nothing was voiced.
+    """
+
+    segments = detect_speech_segments(audio, sample_rate)
+    if not segments:
+        return np.zeros(0, dtype=np.float32)
+
+    gap = np.zeros(int(sample_rate * gap_ms / 1000), dtype=np.float32)
+    pieces = []
+    for start, end in segments:
+        if pieces:
+            pieces.append(gap)
+        pieces.append(np.asarray(audio[start:end], dtype=np.float32))
+
+    return np.concatenate(pieces)
+
+
+class SpeechChunker:
+    """
+    Turns a stream of fixed-size audio blocks into utterances cut at
+    speech boundaries. Audio after the last completed utterance is
+    held back until a pause is seen (or max_segment_seconds is hit),
+    so words are not split across Whisper calls and silence is never
+    transcribed.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE,
+                 min_silence_ms=MIN_SILENCE_MS,
+                 max_segment_seconds=MAX_SEGMENT_SECONDS):
+        self.sample_rate = sample_rate
+        self.min_silence_ms = min_silence_ms
+        self.max_segment_seconds = max_segment_seconds
+        self._pending = np.zeros(0, dtype=np.float32)
+
+    def feed(self, audio):
+        """
+        Add a block and return the list of completed utterances
+        """
+
+        self._pending = np.concatenate((self._pending, np.asarray(audio, dtype=np.float32)))
+
+        segments = detect_speech_segments(
+            self._pending, self.sample_rate,
+            min_silence_ms=self.min_silence_ms,
+            max_segment_seconds=self.max_segment_seconds
+        )
+        if not segments:
+            # Keep a short tail in case speech starts right at the boundary
+            keep = int(self.sample_rate * self.min_silence_ms / 1000)
+            self._pending = self._pending[-keep:]
+            return []
+
+        # A span is complete once enough silence follows it
+        open_after = len(self._pending) - int(self.sample_rate * self.min_silence_ms / 1000)
+        max_samples = int(self.sample_rate * self.max_segment_seconds)
+
+        done = []
+        consumed = 0
+        for start, end in segments:
+            if end <= open_after or end - start >= max_samples:
+                done.append(self._pending[start:end])
+                consumed = end
+            else:
+                consumed = start
+                break
+
+        self._pending = self._pending[consumed:]
+        return done
+
+    def flush(self):
+        """
+        Return whatever speech is still buffered at end of stream
+        """
+
+        pending, self._pending = self._pending, np.zeros(0, dtype=np.float32)
+        voiced = collect_voiced_audio(pending, self.sample_rate)
+        return [voiced] if len(voiced) else []
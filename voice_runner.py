@@ -1,7 +1,11 @@
 from voice_transcriber import transcribe_voice
 from module3_runner import run_module_3_from_text
+from metrics import collect_timings
 
-def run_voice_analysis(audio_path: str):
-    transcript = transcribe_voice(audio_path)
-    result = run_module_3_from_text(transcript)
+def run_voice_analysis(audio):
+    with collect_timings() as timings:
+        transcript = transcribe_voice(audio)
+        result = run_module_3_from_text(transcript)
+        if timings is not None:
+            result["timings"] = timings.as_dict()
     return transcript, result
@@ -1,10 +1,112 @@
-import whisper
+import io
 import os
+import struct
+import subprocess
+import tempfile
+import wave
+
+import numpy as np
+
+from config import UPLOAD_SPOOL_BYTES, UPLOAD_SPOOL_DIR
+from vad import SAMPLE_RATE, collect_voiced_audio
+from live_pipeline import read_wav
+from model_registry import register_model, get_model
+from metrics import timer
 
 #explicitly set ffmpeg path (CRITICAL FOR WINDOWS)
 os.environ["PATH"] += os.pathsep + r"C:\ffmpeg-8.0.1-essentials_build\bin"
-model = whisper.load_model("small")
 
-def transcribe_voice(audio_path: str) -> str:
-    result = model.transcribe(audio_path)
+def _load_whisper_small():
+    import whisper
+    return whisper.load_model("small")
+
+register_model("whisper-small", _load_whisper_small)
+
+def transcribe_voice(audio) -> str:
+    """
+    Transcribe a path, raw audio file bytes, or a float32 array
+    already at SAMPLE_RATE
+    """
+
+    audio = load_audio(audio)
+
+    # Only voiced spans go to Whisper; silent voicemails cost nothing
+    voiced = collect_voiced_audio(audio, SAMPLE_RATE)
+    if len(voiced) == 0:
+        return ""
+
+    model = get_model("whisper-small")
+    with timer("whisper"):
+        result = model.transcribe(voiced)
     return result["text"]
+
+def load_audio(source):
+    """
+    Mono float32 at SAMPLE_RATE. PCM WAV bytes are decoded directly;
+    other formats are piped through ffmpeg, except MP4 / M4A with the
+    index (moov) after the media and bytes above UPLOAD_SPOOL_BYTES,
+    which ffmpeg reads from a temp file.
+    """
+
+    if isinstance(source, np.ndarray):
+        return source.astype(np.float32, copy=False)
+
+    if isinstance(source, str):
+        import whisper
+        return whisper.load_audio(source, sr=SAMPLE_RATE)
+
+    data = bytes(source)
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        try:
+            return read_wav(io.BytesIO(data), SAMPLE_RATE)
+        except (wave.Error, ValueError, EOFError):
+            pass  # compressed WAV codecs still go through ffmpeg
+
+    if len(data) <= UPLOAD_SPOOL_BYTES and not _needs_seeking(data):
+        return _ffmpeg_decode("pipe:0", data)
+
+    fd, path = tempfile.mkstemp(prefix="decepta-audio-", dir=UPLOAD_SPOOL_DIR)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(data)
+        return _ffmpeg_decode(path)
+    finally:
+        os.remove(path)
+
+def _needs_seeking(data):
+    """
+    True for an MP4 / M4A / MOV (ISO BMFF) whose moov box comes after
+    the media, which ffmpeg cannot demux from a pipe
+    """
+
+    if data[4:8] != b"ftyp":
+        return False
+
+    offset = 0
+    while offset + 8 <= len(data):
+        size, box = struct.unpack(">I4s", data[offset:offset + 8])
+        if box == b"moov":
+            return False
+        if box == b"mdat":
+            return True
+        if size == 1 and offset + 16 <= len(data):
+            size = struct.unpack(">Q", data[offset + 8:offset + 16])[0]
+        if size < 8:
+            break
+        offset += size
+    # Truncated or unusual layout: a file always works
+    return True
+
+def _ffmpeg_decode(source, data=None):
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0",
+        "-i", source,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE),
+        "pipe:1"
+    ]
+    try:
+        out = subprocess.run(cmd, input=data, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to decode audio: {e.stderr.decode(errors='replace')}") from e
+
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0